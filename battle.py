@@ -0,0 +1,60 @@
+# the numbers behind a conquer battle, shared by the bot and the offline simulator
+
+import random
+
+# ships that never spawn as enemies
+SPAWN_EXCLUDED = ("SUPER BATTLE SHIP",)
+
+TURN_TIMEOUT = 30
+
+# the enemy hits back for randint(RETALIATION_MIN, enemy attack)
+RETALIATION_MIN = 10
+
+# defending raises defense by randint(DEFEND_BOOST_MIN, current defense)
+DEFEND_BOOST_MIN = 5
+
+# shipoons looted from a defeated enemy, randint(LOOT_MIN, LOOT_MAX)
+LOOT_MIN = 0
+LOOT_MAX = 50000
+
+# `$conquer auto` gives up after this many turns, the enemy sails off
+AUTO_MAX_TURNS = 1000
+
+
+class BattleResult:
+    __slots__ = ("seed", "turns", "user_hp", "enemy_hp", "loot")
+
+    def __init__(self, seed, turns, user_hp, enemy_hp, loot):
+        self.seed = seed
+        # (weapon name, damage dealt, damage taken) per turn
+        self.turns = turns
+        self.user_hp = user_hp
+        self.enemy_hp = enemy_hp
+        self.loot = loot
+
+    @property
+    def won(self):
+        return self.enemy_hp <= 0
+
+    @property
+    def lost(self):
+        return self.user_hp <= 0
+
+
+def resolve_battle(player, enemy, seed, max_turns=AUTO_MAX_TURNS):
+    # a whole conquer battle in one go for `$conquer auto`: the captain attacks every turn (defending
+    # raises a defense the enemy's hits ignore) and the same seed always plays out the same fight
+    rng = random.Random(seed)
+    user_hp = player.hp
+    enemy_hp = enemy.hp
+    turns = []
+
+    while user_hp > 0 and enemy_hp > 0 and len(turns) < max_turns:
+        weapon_name, damage = rng.choice(player.weapons) if player.weapons else ("Unknown Weapon", 0)
+        enemy_hp -= damage
+        retaliation = rng.randint(RETALIATION_MIN, enemy.attack) if enemy_hp > 0 else 0
+        user_hp -= retaliation
+        turns.append((weapon_name, damage, retaliation))
+
+    loot = rng.randint(LOOT_MIN, LOOT_MAX) if enemy_hp <= 0 else 0
+    return BattleResult(seed, turns, user_hp, enemy_hp, loot)
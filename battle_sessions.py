@@ -0,0 +1,61 @@
+import asyncio
+
+
+class BattleSessions:
+    # every battle waiting for a move is one entry keyed by (channel_id, user_id),
+    # so an incoming message costs a single dict lookup no matter how many battles are running
+    def __init__(self, choices=("1", "2", "3")):
+        self.choices = frozenset(choices)
+        self.active = set()
+        self.waiting = {}
+
+    def __len__(self):
+        return len(self.active)
+
+    def begin(self, channel_id, user_id):
+        key = (channel_id, user_id)
+        if key in self.active:
+            return None
+        self.active.add(key)
+        return key
+
+    def end(self, key):
+        self.active.discard(key)
+        pending = self.waiting.pop(key, None)
+        if pending is not None:
+            future, timer = pending
+            timer.cancel()
+            if not future.done():
+                future.cancel()
+
+    async def next_move(self, key, timeout=30):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # the loop's own timer heap is the shared deadline scheduler, no task or listener per battle
+        timer = loop.call_later(timeout, self.expire, key, future)
+        self.waiting[key] = (future, timer)
+        try:
+            return await future
+        finally:
+            if self.waiting.get(key, (None,))[0] is future:
+                del self.waiting[key]
+            timer.cancel()
+
+    def expire(self, key, future):
+        if not future.done():
+            future.set_result(None)
+
+    def route(self, message):
+        pending = self.waiting.get((message.channel.id, message.author.id))
+        if pending is None:
+            return False
+
+        content = message.content.strip().lower()
+        if content not in self.choices:
+            return False
+
+        future, _ = pending
+        if future.done():
+            return False
+        future.set_result(content)
+        return True
@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Drives the bot's commands offline against a synthetic user store and reports throughput and latency.
+#
+#   python -m benchmarks.bench_commands --users 100000 --concurrency 50 --ops 5000
+#   python -m benchmarks.bench_commands --store json --users 10000
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTER_SHIPS = ["Titanic", "USS Constitution", "Queen Mary", "USS Enterprise (CVN-65)", "Queen Mary 2"]
+DEFAULT_MIX = "balance=30,shop=20,info=20,buy=10,select=10,conquer=10"
+
+
+def synthetic_users(count, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        starter = rng.choice(STARTER_SHIPS)
+        yield str(i), {
+            "name": f"captain{i}",
+            "balance": rng.randint(0, 200000),
+            "selected_ship": starter,
+            "ships": [starter],
+            "last_beg": "",
+            "wins": rng.randint(0, 50),
+            "loses": rng.randint(0, 50),
+        }
+
+
+def build_store(kind, directory, count, seed):
+    from user_store import SqliteUserStore
+
+    json_path = os.path.join(directory, "users.json")
+    db_path = os.path.join(directory, "users.db")
+
+    if kind == "json":
+        with open(json_path, "w") as f:
+            json.dump(dict(synthetic_users(count, seed)), f)
+    else:
+        store = SqliteUserStore(db_path, migrate_from=None)
+        batch = []
+        for item in synthetic_users(count, seed):
+            batch.append(item)
+            if len(batch) >= 50000:
+                store.put_many(batch)
+                batch = []
+        if batch:
+            store.put_many(batch)
+        store.close()
+
+    return json_path, db_path
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+async def run_command(main, name, user, channel):
+    from benchmarks.fake_discord import FakeContext, autoplay
+
+    ctx = FakeContext(main.bot, user, channel, command=main.bot.get_command(name))
+
+    if name == "balance":
+        await main.balance(ctx)
+    elif name == "shop":
+        await main.shop(ctx)
+    elif name == "info":
+        await main.info(ctx, ship_name=random.choice(main.catalog.all()).name)
+    elif name == "buy":
+        await main.buy(ctx, ship_name=random.choice(main.catalog.all()).name)
+    elif name == "select":
+        await main.select(ctx, ship_name=random.choice(STARTER_SHIPS))
+    elif name == "conquer":
+        main.bot.encounters.spawn(channel.id, main.catalog.get("Titanic"))
+        autoplay(main.bot, ctx, ["1"] * 200)
+        await main.conquer(ctx)
+    elif name == "conquer_auto":
+        main.bot.encounters.spawn(channel.id, main.catalog.get("Titanic"))
+        await main.conquer(ctx, "auto")
+    else:
+        raise ValueError(f"Unknown command in mix: {name}")
+
+
+async def run(main, args):
+    from benchmarks.fake_discord import FakeUser, FakeChannel, FakeGuild
+
+    weights = parse_mix(args.mix)
+    names = list(weights)
+    guilds = [FakeGuild() for _ in range(args.guilds)]
+    plan = random.choices(names, weights=[weights[name] for name in names], k=args.ops)
+
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    queue = asyncio.Queue()
+    for name in plan:
+        queue.put_nowait(name)
+
+    async def worker():
+        while True:
+            try:
+                name = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            user_id = random.randrange(args.users)
+            user = FakeUser(f"captain{user_id}", user_id=user_id)
+            channel = FakeChannel(random.choice(guilds), send_latency=args.send_latency / 1000)
+
+            started = time.perf_counter()
+            try:
+                await run_command(main, name, user, channel)
+            except Exception as e:
+                errors[name] += 1
+                if errors[name] == 1:
+                    print(f"{name} failed: {e!r}")
+            latencies[name].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    flush_started = time.perf_counter()
+    await main.outbox.close()
+    await main.persistence.close()
+    flush_elapsed = time.perf_counter() - flush_started
+
+    messages = (main.outbox.queued, main.outbox.sent)
+    return elapsed, flush_elapsed, latencies, errors, messages
+
+
+def report(args, elapsed, flush_elapsed, latencies, errors, messages):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{total:,} commands against {args.users:,} users ({args.store}), concurrency {args.concurrency}")
+    print(f"{elapsed:.2f}s total, {total / elapsed:,.0f} commands/s, final flush {flush_elapsed * 1000:.1f} ms")
+    print(f"{messages[0]:,} messages queued, {messages[1]:,} sent after coalescing\n")
+    print(f"{'command':<10}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+
+    rows = []
+    for name, values in latencies.items():
+        values.sort()
+        row = {
+            "command": name,
+            "count": len(values),
+            "errors": errors[name],
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": (values[-1] if values else 0.0) * 1000,
+        }
+        rows.append(row)
+        print(f"{name:<10}{row['count']:>8}{row['errors']:>8}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"users": args.users, "store": args.store, "concurrency": args.concurrency,
+                       "messages_queued": messages[0], "messages_sent": messages[1],
+                       "elapsed": elapsed, "throughput": total / elapsed, "commands": rows}, f, indent=4)
+        print(f"\nWrote results to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the ShipRoyale commands")
+    parser.add_argument("--users", type=int, default=1000, help="synthetic registered users (1k to 1M)")
+    parser.add_argument("--store", choices=["sqlite", "json"], default="sqlite")
+    parser.add_argument("--ops", type=int, default=5000, help="commands to run")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="command weights, e.g. balance=3,buy=1")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="simulated ms per message send")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Building {args.users:,} synthetic users...")
+        json_path, db_path = build_store(args.store, directory, args.users, args.seed)
+
+        os.environ["USER_STORE"] = args.store
+        os.environ["USERS_JSON"] = json_path
+        os.environ["USERS_DB"] = db_path
+        os.chdir(ROOT)
+        sys.path.insert(0, ROOT)
+
+        import main as bot_main
+
+        results = asyncio.run(run(bot_main, args))
+        report(args, *results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+# Times ship-name autocomplete lookups against a synthetic catalog of thousands of ships.
+#
+#   python -m benchmarks.bench_search --ships 5000 --queries 10000
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_ships(template, count, rng):
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))).title() for _ in range(count)]
+    for i in range(count):
+        data = dict(rng.choice(template))
+        prefix = rng.choice(["USS ", "HMS ", "RMS ", ""])
+        data["ship_name"] = f"{prefix}{rng.choice(words)} {rng.choice(words)} ({rng.choice(['BB', 'CV', 'DD'])}-{i})"
+        yield data
+
+
+def keystrokes(names, count, typo_rate, rng):
+    # what a user has typed so far, sometimes with one wrong letter
+    for _ in range(count):
+        name = rng.choice(names)
+        query = name[:rng.randint(1, len(name))]
+        if len(query) > 3 and rng.random() < typo_rate:
+            i = rng.randrange(len(query))
+            query = query[:i] + rng.choice(string.ascii_lowercase) + query[i + 1:]
+        yield query
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autocomplete latency for the ship-name index")
+    parser.add_argument("--ships", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--typo-rate", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from catalog_build import build_catalog
+    from ship_catalog import ShipCatalog
+    from ship_search import ShipIndex
+
+    rng = random.Random(args.seed)
+    catalog = ShipCatalog(os.path.join(ROOT, "ships.json"), auto_reload=False)
+    with open(os.path.join(ROOT, "ships.json"), "r") as f:
+        template = json.load(f)
+    index = ShipIndex(catalog)
+
+    started = time.perf_counter()
+    catalog.apply(None, build_catalog(list(synthetic_ships(template, args.ships, rng))))
+    print(f"Indexed {len(index.entries):,} names and aliases in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    timings = []
+    for query in keystrokes([ship.name for ship in catalog.all()], args.queries, args.typo_rate, rng):
+        started = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    print(f"{len(timings):,} lookups: p50 {p50:.3f} ms, p99 {p99:.3f} ms, max {timings[-1] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import asyncio
+import sys
+import time
+
+# Checks that changes made while a write-behind flush is still writing reach the store, for user records and
+# cooldowns, against a store whose writes are slow.
+#
+#   python -m benchmarks.check_flush
+
+
+class SlowStore:
+    def __init__(self, delay):
+        self.delay = delay
+        self.users = {}
+        self.cooldowns = {}
+
+    def get(self, key):
+        return self.users.get(key)
+
+    def put_many(self, items):
+        time.sleep(self.delay)
+        self.users.update(items)
+
+    def put_cooldowns(self, items):
+        time.sleep(self.delay)
+        self.cooldowns.update(items)
+
+    def close(self):
+        pass
+
+
+class EmptyCatalog:
+    def names_of(self, bits):
+        return []
+
+
+async def check(delay=0.2, interval=0.05):
+    from cooldowns import Cooldowns
+    from persistence import Persistence
+    from records import User
+
+    store = SlowStore(delay)
+    persistence = Persistence(store, EmptyCatalog(), flush_interval=interval)
+    cooldowns = Cooldowns(persistence, flush_interval=interval)
+
+    persistence.put(1, User(1, "first", 0, None, 0, None, 0, 0))
+    cooldowns.start("beg:user:1", 3600)
+    # both flushes are now inside their slow write
+    await asyncio.sleep(interval + delay / 2)
+    persistence.put(2, User(2, "second", 0, None, 0, None, 0, 0))
+    cooldowns.start("beg:user:2", 3600)
+
+    # no other change comes, the second flush has to happen on its own
+    await asyncio.sleep(interval * 4 + delay * 4)
+
+    problems = []
+    if sorted(store.users) != ["1", "2"]:
+        problems.append(f"users in the store: {sorted(store.users)}, still dirty: {persistence.dirty}")
+    if sorted(store.cooldowns) != ["beg:user:1", "beg:user:2"]:
+        problems.append(f"cooldowns in the store: {sorted(store.cooldowns)}, still dirty: {cooldowns.dirty}")
+
+    await cooldowns.close()
+    await persistence.close()
+    return problems
+
+
+def main():
+    problems = asyncio.run(check())
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK changes made during a slow flush were written")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import asyncio
+import itertools
+from datetime import datetime, timezone
+
+# Just enough of discord's ctx/channel/message objects to drive the bot's commands without a connection.
+
+_ids = itertools.count(1_000_000)
+
+
+class FakePermissions:
+    def __init__(self, administrator=False):
+        self.administrator = administrator
+        self.send_messages = True
+
+
+class FakeUser:
+    def __init__(self, name, user_id=None, administrator=False):
+        self.name = name
+        self.id = user_id if user_id is not None else next(_ids)
+        self.display_name = name
+        self.mention = f"<@{self.id}>"
+        self.bot = False
+        self.guild_permissions = FakePermissions(administrator)
+
+
+class FakeGuild:
+    def __init__(self, guild_id=None, name="bench guild"):
+        self.id = guild_id if guild_id is not None else next(_ids)
+        self.name = name
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content="", embed=None, embeds=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.embeds = embeds if embeds is not None else ([embed] if embed is not None else [])
+        self.created_at = datetime.now(timezone.utc)
+
+    async def delete(self):
+        pass
+
+    async def edit(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+        return self
+
+
+class FakeChannel:
+    def __init__(self, guild=None, channel_id=None, send_latency=0.0):
+        self.id = channel_id if channel_id is not None else next(_ids)
+        self.guild = guild or FakeGuild()
+        self.mention = f"<#{self.id}>"
+        self.send_latency = send_latency
+        self.sent = []
+        self.listeners = []
+
+    async def send(self, content=None, **kwargs):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        message = FakeMessage(self, None, content or "", kwargs.get("embed"), kwargs.get("embeds"))
+        self.sent.append(message)
+        for listener in self.listeners:
+            listener(message)
+        return message
+
+    def permissions_for(self, member):
+        return FakePermissions()
+
+
+class FakeContext:
+    def __init__(self, bot, author, channel, command=None):
+        self.bot = bot
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.command = command
+        self.interaction = None
+        self.message = FakeMessage(channel, author)
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+def autoplay(bot, ctx, moves):
+    # answer every battle menu the bot sends to this channel with the next scripted move
+    moves = iter(moves)
+
+    def on_send(message):
+        if "Choose your action" not in (message.content or ""):
+            return
+        move = next(moves, "3")
+        reply = FakeMessage(ctx.channel, ctx.author, move)
+        asyncio.get_running_loop().call_soon(bot.battles.route, reply)
+
+    ctx.channel.listeners.append(on_send)
+    return ctx
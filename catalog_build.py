@@ -0,0 +1,190 @@
+import argparse
+import hashlib
+import json
+import marshal
+import os
+import sys
+from numbers import Number
+
+from battle import RETALIATION_MIN, DEFEND_BOOST_MIN
+
+# Checks ships.json and compiles it into ships.snapshot, which the bot loads instead of the JSON.
+#
+#   python catalog_build.py
+#   python catalog_build.py --source ships.json --output ships.snapshot
+
+SNAPSHOT_FORMAT = 1
+
+# list field -> the key its entries name themselves with in the hand-written JSON
+ITEM_LISTS = {
+    "ship_stats": "stat_name",
+    "ship_weapons": "weapon_name",
+    "ship_modules": "module_name",
+    "ship_defense_skills": "defense_name",
+}
+TEXT_FIELDS = ("ship_name", "ship_type", "ship_image", "ship_description")
+
+
+class CatalogError(ValueError):
+    def __init__(self, problems):
+        super().__init__(f"{len(problems)} problem(s) in the ship catalog:\n" + "\n".join(f"  - {problem}" for problem in problems))
+        self.problems = problems
+
+
+def snapshot_path_for(source):
+    return os.path.splitext(source)[0] + ".snapshot"
+
+
+def normalize_items(label, items, name_key, problems):
+    if not isinstance(items, list):
+        problems.append(f"{label} must be a list")
+        return []
+
+    normalized = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            problems.append(f"{label}[{i}] must be an object")
+            continue
+        name = item.get("name", item.get(name_key))
+        value = item.get("value", item.get("stat_value"))
+        if not isinstance(name, str) or not name.strip():
+            problems.append(f"{label}[{i}] has no {name_key}")
+        if not isinstance(value, Number) or isinstance(value, bool):
+            problems.append(f"{label}[{i}] ({name}) needs a numeric stat_value, got {value!r}")
+        normalized.append({"name": name, "value": value})
+    return normalized
+
+
+def normalize_ship(raw, position, problems):
+    if not isinstance(raw, dict):
+        problems.append(f"entry {position} must be an object")
+        return None
+
+    label = raw.get("ship_name") if isinstance(raw.get("ship_name"), str) else f"entry {position}"
+    ship = {}
+    for field in TEXT_FIELDS:
+        value = raw.get(field)
+        if not isinstance(value, str) or not value.strip():
+            problems.append(f"{label}: {field} must be a non-empty string")
+        ship[field] = value
+
+    aliases = raw.get("ship_aliases", [])
+    if not isinstance(aliases, list) or not all(isinstance(alias, str) for alias in aliases):
+        problems.append(f"{label}: ship_aliases must be a list of strings")
+        aliases = []
+    ship["ship_aliases"] = aliases
+
+    for field, name_key in ITEM_LISTS.items():
+        ship[field] = normalize_items(f"{label}: {field}", raw.get(field, []), name_key, problems)
+
+    # the rules in battle.py need these, a gap here used to surface as a crash inside $buy or $conquer
+    stats = {item["name"].lower(): item["value"] for item in ship["ship_stats"] if isinstance(item["name"], str)}
+    if not isinstance(stats.get("hp"), Number) or stats["hp"] <= 0:
+        problems.append(f"{label}: needs an HP stat above 0")
+    if not isinstance(stats.get("price"), Number) or stats["price"] < 0:
+        problems.append(f"{label}: needs a Price stat of 0 or more")
+    if not ship["ship_modules"]:
+        problems.append(f"{label}: needs at least one module to be hit in battle")
+
+    attack = sum(item["value"] for item in ship["ship_weapons"] if isinstance(item["value"], Number))
+    if attack < RETALIATION_MIN:
+        problems.append(f"{label}: weapons add up to {attack}, at least {RETALIATION_MIN} is needed to retaliate")
+    defense = ship["ship_defense_skills"][0]["value"] if ship["ship_defense_skills"] else None
+    if not isinstance(defense, Number) or defense < DEFEND_BOOST_MIN:
+        problems.append(f"{label}: the first defense skill must be at least {DEFEND_BOOST_MIN}")
+
+    return ship
+
+
+def build_catalog(raw_ships):
+    # normalized ship dicts, or CatalogError listing every problem at once
+    if not isinstance(raw_ships, list):
+        raise CatalogError(["the catalog must be a JSON list of ships"])
+
+    problems = []
+    ships = []
+    seen = set()
+    for position, raw in enumerate(raw_ships):
+        ship = normalize_ship(raw, position, problems)
+        if ship is None:
+            continue
+        name = ship["ship_name"]
+        if isinstance(name, str):
+            if name.lower() in seen:
+                problems.append(f"{name}: listed twice")
+            seen.add(name.lower())
+        ships.append(ship)
+
+    if problems:
+        raise CatalogError(problems)
+    return ships
+
+
+def source_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_snapshot(path, digest, ships):
+    # marshal only promises to read back on the same Python version, so that is recorded too
+    header = {"format": SNAPSHOT_FORMAT, "python": list(sys.version_info[:2]), "source": digest}
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        marshal.dump((header, ships), f)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path, digest):
+    # the compiled ships if the snapshot was built from exactly this source, else None
+    try:
+        with open(path, "rb") as f:
+            header, ships = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if header.get("format") != SNAPSHOT_FORMAT or header.get("python") != list(sys.version_info[:2]):
+        return None
+    if header.get("source") != digest:
+        return None
+    return ships
+
+
+def load_catalog(source, snapshot_path=None):
+    # the bot's way in: the snapshot when it is current, otherwise build (and save) it from the JSON
+    snapshot_path = snapshot_path or snapshot_path_for(source)
+    with open(source, "rb") as f:
+        data = f.read()
+    digest = source_digest(data)
+
+    ships = read_snapshot(snapshot_path, digest)
+    if ships is not None:
+        return ships
+
+    ships = build_catalog(json.loads(data))
+    try:
+        write_snapshot(snapshot_path, digest, ships)
+    except OSError as e:
+        print(f"Could not write {snapshot_path}: {e}")
+    return ships
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the ship catalog and compile it for the bot")
+    parser.add_argument("--source", default="ships.json")
+    parser.add_argument("--output", help="snapshot path (default: next to the source, .snapshot)")
+    args = parser.parse_args()
+
+    with open(args.source, "rb") as f:
+        data = f.read()
+    try:
+        ships = build_catalog(json.loads(data))
+    except ValueError as e:
+        print(f"{args.source}: {e}")
+        sys.exit(1)
+
+    output = args.output or snapshot_path_for(args.source)
+    write_snapshot(output, source_digest(data), ships)
+    print(f"Compiled {len(ships)} ships from {args.source} into {output} ({os.path.getsize(output):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
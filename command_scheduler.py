@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import Counter, deque
+
+
+class CommandJob:
+    __slots__ = ("guild_key", "user_id", "run", "task", "detached")
+
+    def __init__(self, guild_key, user_id, run):
+        self.guild_key = guild_key
+        self.user_id = user_id
+        self.run = run
+        self.task = None
+        self.detached = False
+
+
+class CommandScheduler:
+    # every command waits in its guild's queue and guilds take turns getting a slot, so one guild
+    # spamming commands fills its own queue instead of the loop; a full queue sheds the command
+    def __init__(self, max_running=64, per_guild=4, per_user=1, max_queued_per_user=3, max_queued_per_guild=20, max_queued=2000, busy_reply_interval=10.0):
+        self.max_running = max_running
+        self.per_guild = per_guild
+        self.per_user = per_user
+        self.max_queued_per_user = max_queued_per_user
+        self.max_queued_per_guild = max_queued_per_guild
+        self.max_queued = max_queued
+        self.busy_reply_interval = busy_reply_interval
+        self.queues = {}
+        # guilds with queued commands, in the order they get their next turn
+        self.ring = deque()
+        self.running = 0
+        self.running_by_guild = Counter()
+        self.running_by_user = Counter()
+        self.queued = 0
+        self.queued_by_user = Counter()
+        self.shed = 0
+        self.last_busy_reply = {}
+
+    def submit(self, guild_key, user_id, run):
+        # run is a coroutine function called when the command gets its slot; None when it was shed
+        queue = self.queues.get(guild_key)
+        if self.queued >= self.max_queued or (queue is not None and len(queue) >= self.max_queued_per_guild):
+            self.shed += 1
+            return None
+        # one user spamming can't fill the guild's queue for everyone else
+        if self.queued_by_user[user_id] >= self.max_queued_per_user:
+            self.shed += 1
+            return None
+
+        job = CommandJob(guild_key, user_id, run)
+        if queue is None:
+            queue = self.queues[guild_key] = deque()
+            self.ring.append(guild_key)
+        queue.append(job)
+        self.queued += 1
+        self.queued_by_user[user_id] += 1
+        self.dispatch()
+        return job
+
+    def should_reply_busy(self, guild_key):
+        # one "busy" reply per guild per interval, shedding must not turn into a flood of its own
+        now = time.monotonic()
+        if now - self.last_busy_reply.get(guild_key, 0) < self.busy_reply_interval:
+            return False
+        self.last_busy_reply[guild_key] = now
+        if len(self.last_busy_reply) > 10000:
+            self.last_busy_reply = {key: at for key, at in self.last_busy_reply.items() if now - at < self.busy_reply_interval}
+        return True
+
+    def next_job(self, queue):
+        if self.running_by_guild[queue[0].guild_key] >= self.per_guild:
+            return None
+        for i, job in enumerate(queue):
+            if self.running_by_user[job.user_id] < self.per_user:
+                del queue[i]
+                return job
+        return None
+
+    def dispatch(self):
+        # round-robin over the guilds, one command per turn; stops after a whole round starts nothing
+        idle = 0
+        while self.ring and self.running < self.max_running and idle < len(self.ring):
+            guild_key = self.ring[0]
+            self.ring.rotate(-1)
+            queue = self.queues[guild_key]
+            job = self.next_job(queue)
+            if job is None:
+                idle += 1
+                continue
+
+            idle = 0
+            self.queued -= 1
+            self.queued_by_user[job.user_id] -= 1
+            if not self.queued_by_user[job.user_id]:
+                del self.queued_by_user[job.user_id]
+            if not queue:
+                del self.queues[guild_key]
+                # the rotate above just moved it to the end
+                self.ring.pop()
+            self.start(job)
+
+    def start(self, job):
+        self.running += 1
+        self.running_by_guild[job.guild_key] += 1
+        self.running_by_user[job.user_id] += 1
+        job.task = asyncio.get_running_loop().create_task(job.run())
+        job.task.add_done_callback(lambda task: self.finish(job))
+
+    def detach(self, job):
+        # for commands that go on waiting for the user (a conquer battle), they keep running without a slot
+        if job is None or job.detached:
+            return
+        job.detached = True
+        self.running -= 1
+        self.running_by_guild[job.guild_key] -= 1
+        if not self.running_by_guild[job.guild_key]:
+            del self.running_by_guild[job.guild_key]
+        self.running_by_user[job.user_id] -= 1
+        if not self.running_by_user[job.user_id]:
+            del self.running_by_user[job.user_id]
+        self.dispatch()
+
+    def finish(self, job):
+        if not job.task.cancelled() and job.task.exception() is not None:
+            print(f"Command task failed: {job.task.exception()!r}")
+        self.detach(job)
@@ -0,0 +1,158 @@
+import math
+import time
+
+from discord.ext import commands
+
+from delayed_flush import DelayedFlush
+
+
+class OnCooldown(commands.CheckFailure):
+    def __init__(self, remaining):
+        super().__init__(f"On cooldown for {remaining:.0f}s")
+        self.remaining = remaining
+
+
+def format_duration(seconds):
+    seconds = max(1, math.ceil(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes = math.ceil(seconds / 60)
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes}m" if minutes else f"{hours}h"
+
+
+class TimingWheel:
+    # hashed wheel of `slots` buckets, `tick` seconds each; a key sits in the bucket of its expiry tick and
+    # is dropped when the wheel passes it, entries longer than one turn just get looked at once per turn
+    def __init__(self, tick=1.0, slots=512):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.expires = {}
+        self.current = int(time.time() // tick)
+
+    def __len__(self):
+        return len(self.expires)
+
+    def slot_for(self, expires):
+        return self.slots[int(expires // self.tick) % len(self.slots)]
+
+    def add(self, key, expires):
+        self.remove(key)
+        self.expires[key] = expires
+        self.slot_for(expires).add(key)
+
+    def remove(self, key):
+        expires = self.expires.pop(key, None)
+        if expires is not None:
+            self.slot_for(expires).discard(key)
+
+    def get(self, key, now):
+        expires = self.expires.get(key)
+        if expires is None or expires <= now:
+            return None
+        return expires
+
+    def advance(self, now):
+        target = int(now // self.tick)
+        steps = min(target - self.current, len(self.slots))
+        for step in range(1, steps + 1):
+            slot = self.slots[(self.current + step) % len(self.slots)]
+            for key in [key for key in slot if self.expires[key] <= now]:
+                slot.discard(key)
+                del self.expires[key]
+        self.current = max(self.current, target)
+
+
+class Cooldowns:
+    # cooldowns live in memory and are written to the user store in batches, checks never touch disk
+    def __init__(self, persistence, flush_interval=5.0):
+        self.persistence = persistence
+        self.wheel = TimingWheel()
+        self.dirty = {}
+        self.flusher = DelayedFlush(self.write_dirty, flush_interval, "cooldowns")
+
+    def __len__(self):
+        return len(self.wheel)
+
+    async def load(self):
+        items = await self.persistence.run(self.persistence.store.cooldowns, time.time())
+        for key, expires in items:
+            if key not in self.wheel.expires and key not in self.dirty:
+                self.wheel.add(key, expires)
+        print(f"Loaded {len(items)} active cooldowns.")
+
+    def key_for(self, ctx, bucket):
+        name = ctx.command.qualified_name
+        if bucket == "guild" and ctx.guild is not None:
+            return f"{name}:guild:{ctx.guild.id}"
+        if bucket == "member" and ctx.guild is not None:
+            return f"{name}:member:{ctx.guild.id}:{ctx.author.id}"
+        return f"{name}:user:{ctx.author.id}"
+
+    def remaining(self, key):
+        now = time.time()
+        self.wheel.advance(now)
+        expires = self.wheel.get(key, now)
+        return expires - now if expires is not None else 0
+
+    def start(self, key, seconds):
+        expires = time.time() + seconds
+        self.wheel.add(key, expires)
+        self.mark(key, expires)
+
+    def clear(self, key):
+        self.wheel.remove(key)
+        self.mark(key, None)
+
+    def cancel(self, ctx):
+        # for commands that bail out early and should not cost the user their cooldown
+        key = getattr(ctx, "cooldown_key", None)
+        if key is not None:
+            self.clear(key)
+            ctx.cooldown_key = None
+
+    def command(self, seconds, bucket="user"):
+        # the check only looks, $help runs every command's checks to list them; the cooldown starts in the
+        # command's before_invoke hook, with no await between its look and the start, so two quick invocations
+        # can't both get through. A command that ends in an error gives it back (MyBot.on_command_error calls cancel)
+        def predicate(ctx):
+            remaining = self.remaining(self.key_for(ctx, bucket))
+            if remaining > 0:
+                raise OnCooldown(remaining)
+            return True
+
+        async def start(ctx):
+            key = self.key_for(ctx, bucket)
+            remaining = self.remaining(key)
+            if remaining > 0:
+                raise OnCooldown(remaining)
+            self.start(key, seconds)
+            ctx.cooldown_key = key
+
+        def decorator(func):
+            return commands.before_invoke(start)(commands.check(predicate)(func))
+
+        return decorator
+
+    def mark(self, key, expires):
+        self.dirty[key] = expires
+        self.flusher.schedule()
+
+    async def flush(self):
+        await self.flusher.flush()
+
+    async def write_dirty(self):
+        if not self.dirty:
+            return
+        batch, self.dirty = self.dirty, {}
+        try:
+            await self.persistence.run(self.persistence.store.put_cooldowns, list(batch.items()))
+        except Exception:
+            for key, expires in batch.items():
+                self.dirty.setdefault(key, expires)
+            raise
+
+    async def close(self):
+        await self.flusher.close()
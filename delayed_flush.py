@@ -0,0 +1,51 @@
+import asyncio
+
+
+class DelayedFlush:
+    # calls `write` once `interval` seconds after the first change instead of on every change, one write at a
+    # time; a write that fails is retried an interval later, `write` has to keep what it couldn't save
+    def __init__(self, write, interval, label):
+        self.write = write
+        self.interval = interval
+        self.label = label
+        self.task = None
+        # something changed while the task was already past its sleep, it has to go round again
+        self.pending = False
+        self.lock = None
+        self.closed = False
+
+    def schedule(self):
+        if self.closed:
+            return
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.delayed())
+        else:
+            self.pending = True
+
+    async def delayed(self):
+        await asyncio.sleep(self.interval)
+        # changes from here on may miss this write
+        self.pending = False
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Failed to save {self.label}: {e}")
+            self.pending = True
+
+        if self.pending:
+            # we are still self.task, schedule would think a flush is already on its way
+            self.task = None
+            self.schedule()
+
+    async def flush(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            await self.write()
+
+    async def close(self):
+        self.closed = True
+        await self.flush()
+        # after our flush the pending task can only be sleeping, so cancelling it loses nothing
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
@@ -0,0 +1,117 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class EconomyError(Exception):
+    pass
+
+
+class NotRegistered(EconomyError):
+    pass
+
+
+class AlreadyRegistered(EconomyError):
+    pass
+
+
+class InsufficientFunds(EconomyError):
+    pass
+
+
+class AlreadyOwned(EconomyError):
+    pass
+
+
+class NotOwned(EconomyError):
+    pass
+
+
+class Transaction:
+    def __init__(self, user_id, user):
+        self.user_id = user_id
+        self.user = user
+
+    def require_user(self):
+        if self.user is None:
+            raise NotRegistered(self.user_id)
+        return self.user
+
+    def register(self, record):
+        if self.user is not None:
+            raise AlreadyRegistered(self.user_id)
+        self.user = record
+
+    @property
+    def balance(self):
+        return self.require_user().balance
+
+    def owns(self, ship):
+        return self.require_user().owns(ship.index)
+
+    def debit(self, amount):
+        user = self.require_user()
+        if user.balance < amount:
+            raise InsufficientFunds(self.user_id)
+        user.balance -= amount
+
+    def credit(self, amount):
+        self.require_user().balance += amount
+
+    def grant_ship(self, ship):
+        if self.owns(ship):
+            raise AlreadyOwned(ship.name)
+        self.user.add_ship(ship.index)
+
+    def select_ship(self, ship):
+        if ship is None or not self.owns(ship):
+            raise NotOwned(ship)
+        self.user.selected_ship = ship.name
+
+    def record_win(self):
+        self.require_user().wins += 1
+
+    def record_loss(self):
+        self.require_user().loses += 1
+
+
+class Economy:
+    def __init__(self, persistence, stripes=256, process_locks=None):
+        self.persistence = persistence
+        self.process_locks = process_locks
+        # a fixed pool of locks shared by hash, so memory does not grow with the number of users
+        # while two different users only wait on each other when they land on the same stripe
+        self.locks = [asyncio.Lock() for _ in range(stripes)]
+        self.listeners = []
+
+    def on_commit(self, callback):
+        self.listeners.append(callback)
+        return callback
+
+    def stripe_for(self, user_id):
+        return user_id % len(self.locks)
+
+    async def get(self, user_id, name=None):
+        return await self.persistence.get(user_id, name)
+
+    @asynccontextmanager
+    async def transaction(self, user_id, name=None):
+        stripe = self.stripe_for(user_id)
+        async with self.locks[stripe]:
+            if self.process_locks is not None:
+                await self.process_locks.acquire(stripe)
+            try:
+                original = await self.persistence.get(user_id, name)
+                txn = Transaction(user_id, original.copy() if original is not None else None)
+                if txn.user is not None and name and txn.user.name != name:
+                    txn.user.name = name
+
+                # an exception inside the block skips the commit, the working copy is simply dropped
+                yield txn
+
+                if txn.user is not None and txn.user != original:
+                    await self.persistence.commit(user_id, txn.user)
+                    for callback in self.listeners:
+                        callback(user_id, txn.user)
+            finally:
+                if self.process_locks is not None:
+                    self.process_locks.release(stripe)
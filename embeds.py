@@ -0,0 +1,200 @@
+import math
+import re
+from collections import Counter, OrderedDict, namedtuple
+
+import discord
+
+SHOP_PAGE_SIZE = 5
+BATTLE_LOG_LINES = 8
+
+ShopFilter = namedtuple("ShopFilter", ["ship_type", "min_price", "max_price"])
+NO_FILTER = ShopFilter(None, None, None)
+
+
+def parse_shop_filter(text):
+    # "$shop battleship 10000-50000": words filter the ship type, a-b or a single number bounds the price
+    ship_type = []
+    min_price = max_price = None
+    for word in (text or "").split():
+        price_range = re.fullmatch(r"(\d*)-(\d*)", word)
+        if price_range and word != "-":
+            min_price = int(price_range[1]) if price_range[1] else None
+            max_price = int(price_range[2]) if price_range[2] else None
+        elif word.isdigit():
+            max_price = int(word)
+        else:
+            ship_type.append(word.lower())
+    return ShopFilter(" ".join(ship_type) or None, min_price, max_price)
+
+
+def matches_filter(ship, shop_filter):
+    if shop_filter.ship_type and shop_filter.ship_type not in ship.ship_type.lower():
+        return False
+    if shop_filter.min_price is not None and (ship.price is None or ship.price < shop_filter.min_price):
+        return False
+    if shop_filter.max_price is not None and (ship.price is None or ship.price > shop_filter.max_price):
+        return False
+    return True
+
+
+def format_field(field_data):
+    if not field_data:
+        return "No data available"
+
+    return "\n".join(f"{item['name']}: {item['value']}" for item in field_data)
+
+
+def build_ship_embed(ship, image_url):
+    data = ship.data
+    embed = discord.Embed(
+        title="Ship Details",
+        color=discord.Color.purple(),
+        description=data.get("ship_description", "No description available")
+    )
+
+    embed.add_field(name="Name", value=ship.name, inline=False)
+    embed.add_field(name="Type", value=ship.ship_type, inline=False)
+    embed.add_field(name="Stats", value=format_field(data.get("ship_stats", [])), inline=False)
+    embed.add_field(name="Weapons", value=format_field(data.get("ship_weapons", [])), inline=False)
+    embed.add_field(name="Modules", value=format_field(data.get("ship_modules", [])), inline=False)
+    embed.add_field(name="Defense Skills", value=format_field(data.get("ship_defense_skills", [])), inline=False)
+    embed.set_image(url=image_url)
+    return embed
+
+
+def build_shop_page(ships, page, page_count, image_url):
+    embed = discord.Embed(title="Ship Shop", description="Here are the ships available for purchase:", color=discord.Color.green())
+
+    for ship in ships:
+        embed.add_field(name=ship.name, value=(
+                f"Type: {ship.ship_type}\n"
+                f"Price: {ship.price}\n"
+                f"Description: {ship.data['ship_description'][:100]}..."
+            ), inline=False)
+
+    embed.set_image(url=image_url)
+    embed.set_footer(text=f"Page {page + 1}/{page_count}")
+    return embed
+
+
+def format_turn_log(player, enemy, turns):
+    # long fights are squeezed into BATTLE_LOG_LINES lines of a few turns each
+    size = max(1, math.ceil(len(turns) / BATTLE_LOG_LINES))
+    user_hp = player.hp
+    enemy_hp = enemy.hp
+    lines = []
+    for start in range(0, len(turns), size):
+        chunk = turns[start:start + size]
+        dealt = sum(damage for _, damage, _ in chunk)
+        taken = sum(retaliation for _, _, retaliation in chunk)
+        user_hp -= taken
+        enemy_hp -= dealt
+        label = f"Turn {start + 1}" if len(chunk) == 1 else f"Turns {start + 1}-{start + len(chunk)}"
+        lines.append(f"{label}: 💥 {dealt} dealt, 🔥 {taken} taken → 💙 {max(user_hp, 0)} / 🔻 {max(enemy_hp, 0)}")
+    return "\n".join(lines) or "No turns played"
+
+
+def build_battle_summary(captain, player, enemy, result, captured):
+    if result.won:
+        outcome = f"🎉 **{captain} triumphed!** The enemy ship is defeated and {result.loot} shipoons were looted."
+        if captured:
+            outcome += f"\n🚢 **{enemy.name}** joins your fleet!"
+        color = discord.Color.green()
+    elif result.lost:
+        outcome = f"💀 **{captain}'s ship has been defeated in battle!**"
+        color = discord.Color.red()
+    else:
+        outcome = "🌫️ Neither ship could finish the other, the enemy slips away into the fog."
+        color = discord.Color.light_grey()
+
+    embed = discord.Embed(title=f"⚔️ {player.name} vs {enemy.name}", description=outcome, color=color)
+    embed.add_field(name="Turn log", value=format_turn_log(player, enemy, result.turns), inline=False)
+    weapons = Counter(weapon_name for weapon_name, _, _ in result.turns)
+    embed.add_field(name="Weapons fired", value=", ".join(f"{name} ×{count}" for name, count in weapons.most_common()) or "None", inline=False)
+    turns = len(result.turns)
+    embed.set_footer(text=f"{turns} turn{'' if turns == 1 else 's'} · battle seed {result.seed}")
+    return embed
+
+
+class EmbedCache:
+    # embeds are shared between sends, call .copy() before changing one
+    def __init__(self, catalog, assets=None, max_shop_entries=1024):
+        self.catalog = catalog
+        self.assets = assets
+        self.max_shop_entries = max_shop_entries
+        self.ship_embeds = {}
+        self.filter_masks = OrderedDict()
+        self.shop_lists = OrderedDict()
+        self.shop_pages = OrderedDict()
+        catalog.on_reload(self.invalidate)
+        if assets is not None:
+            assets.on_change(self.invalidate)
+
+    def invalidate(self, source=None):
+        self.ship_embeds.clear()
+        self.filter_masks.clear()
+        self.shop_lists.clear()
+        self.shop_pages.clear()
+
+    def remember(self, cache, key, value):
+        cache[key] = value
+        if len(cache) > self.max_shop_entries:
+            cache.popitem(last=False)
+        return value
+
+    def image_url(self, ship):
+        return self.assets.url_for(ship) if self.assets is not None else ship.data.get("ship_image")
+
+    def shop_image_url(self, ship):
+        # shop messages never carry files
+        return self.assets.public_url(ship) if self.assets is not None else ship.data.get("ship_image")
+
+    def ship(self, ship):
+        # may point at attachment://, send it with assets.file_for(ship) then
+        image_url = self.image_url(ship)
+        key = (ship.name.lower(), image_url)
+        embed = self.ship_embeds.get(key)
+        if embed is None:
+            embed = self.ship_embeds[key] = build_ship_embed(ship, image_url)
+        return embed
+
+    def filter_mask(self, shop_filter):
+        # bitset of the catalog ships a filter lets through, the shop is then just mask & ~owned
+        mask = self.filter_masks.get(shop_filter)
+        if mask is None:
+            mask = 0
+            for ship in self.catalog.all():
+                if matches_filter(ship, shop_filter):
+                    mask |= 1 << ship.index
+            self.remember(self.filter_masks, shop_filter, mask)
+        return mask
+
+    def shop_list(self, owned, shop_filter):
+        key = (owned, shop_filter)
+        ships = self.shop_lists.get(key)
+        if ships is None:
+            ships = self.catalog.ships_in(self.filter_mask(shop_filter) & ~owned)
+            self.remember(self.shop_lists, key, ships)
+        else:
+            self.shop_lists.move_to_end(key)
+        return ships
+
+    def shop_page(self, owned, shop_filter=NO_FILTER, page=0):
+        # (embed, page_count), the embed is None when nothing is left to buy; owned is the user's ship bitset
+        ships = self.shop_list(owned, shop_filter)
+        if not ships:
+            return None, 0
+
+        page_count = math.ceil(len(ships) / SHOP_PAGE_SIZE)
+        page = max(0, min(page, page_count - 1))
+
+        page_ships = ships[page * SHOP_PAGE_SIZE:(page + 1) * SHOP_PAGE_SIZE]
+        # uploaded image links expire, keyed by the url like ship() so a page never outlives its link
+        image_url = self.shop_image_url(page_ships[0])
+        key = (owned, shop_filter, page, image_url)
+        embed = self.shop_pages.get(key)
+        if embed is None:
+            embed = self.remember(self.shop_pages, key, build_shop_page(page_ships, page, page_count, image_url))
+        else:
+            self.shop_pages.move_to_end(key)
+        return embed, page_count
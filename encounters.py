@@ -0,0 +1,95 @@
+import heapq
+import itertools
+import time
+
+
+class EncounterError(Exception):
+    pass
+
+
+class NoEncounter(EncounterError):
+    pass
+
+
+class PartyFull(EncounterError):
+    pass
+
+
+class Encounter:
+    __slots__ = ("channel_id", "ship", "expires", "party", "defeated")
+
+    def __init__(self, channel_id, ship, expires):
+        self.channel_id = channel_id
+        self.ship = ship
+        self.expires = expires
+        self.party = set()
+        self.defeated = False
+
+
+class Encounters:
+    # the enemy ship waiting in each channel, one dict entry per channel plus a heap of expiry times;
+    # battles keep their Encounter object, so a spawn replacing it or evicting it never pulls the ship from under them
+    def __init__(self, ttl=600, max_party=1, max_encounters=50000):
+        self.ttl = ttl
+        self.max_party = max_party
+        self.max_encounters = max_encounters
+        self.by_channel = {}
+        self.expiry = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.by_channel)
+
+    def spawn(self, channel_id, ship):
+        now = time.monotonic()
+        self.evict(now)
+
+        encounter = Encounter(channel_id, ship, now + self.ttl)
+        self.by_channel[channel_id] = encounter
+        heapq.heappush(self.expiry, (encounter.expires, next(self.counter), encounter))
+
+        # over the cap the encounters closest to expiring go first
+        while len(self.by_channel) > self.max_encounters:
+            _, _, oldest = heapq.heappop(self.expiry)
+            self.drop(oldest)
+        return encounter
+
+    def drop(self, encounter):
+        if self.by_channel.get(encounter.channel_id) is encounter:
+            del self.by_channel[encounter.channel_id]
+
+    def evict(self, now):
+        # heap entries of replaced encounters are skipped when they surface, so the heap stays bounded by the ttl
+        while self.expiry and self.expiry[0][0] <= now:
+            _, _, encounter = heapq.heappop(self.expiry)
+            self.drop(encounter)
+
+    def get(self, channel_id):
+        encounter = self.by_channel.get(channel_id)
+        if encounter is None:
+            return None
+        if encounter.expires <= time.monotonic():
+            self.drop(encounter)
+            return None
+        return encounter
+
+    def claim(self, channel_id, user_id):
+        # no await between the checks and joining the party, so two captains can never both take the last spot
+        encounter = self.get(channel_id)
+        if encounter is None or encounter.defeated:
+            raise NoEncounter(channel_id)
+        if user_id not in encounter.party and len(encounter.party) >= self.max_party:
+            raise PartyFull(channel_id)
+        encounter.party.add(user_id)
+        return encounter
+
+    def release(self, encounter, user_id):
+        encounter.party.discard(user_id)
+
+    def defeat(self, encounter):
+        # True for the one captain who sinks it, the ship is theirs and nobody else can claim it
+        if encounter.defeated:
+            return False
+        encounter.defeated = True
+        self.drop(encounter)
+        return True
@@ -0,0 +1,92 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from catalog_build import load_catalog
+from user_store import SqliteUserStore
+
+# Runs the bot as several processes on one machine, each one connecting a slice of the shards.
+#
+#   python launcher.py --processes 4 --shards 16
+#
+# Spawns and battles stay inside the process that owns the guild. Balances and ships live in the shared
+# users.db, written under cross-process locks (see process_locks.py).
+
+
+def split_shards(shard_count, processes):
+    shards = list(range(shard_count))
+    return [shards[i::processes] for i in range(processes) if shards[i::processes]]
+
+
+def child_env(index, shard_count, shard_ids):
+    env = dict(os.environ)
+    env["SHARD_COUNT"] = str(shard_count)
+    env["SHARD_IDS"] = ",".join(str(shard_id) for shard_id in shard_ids)
+    env["SHARED_STORE"] = "1"
+    env["METRICS_FILE"] = f"metrics-{index}.prom"
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ShipRoyale as several shard processes")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shards", type=int, default=None, help="total shard count (default: one per process)")
+    parser.add_argument("--restart-delay", type=float, default=5.0, help="seconds before restarting a crashed process")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if os.getenv("USER_STORE", "sqlite") != "sqlite":
+        sys.exit("Shard processes can only share the sqlite user store, unset USER_STORE.")
+
+    # create the database and run the users.json migration once, before the shards race for it
+    SqliteUserStore(os.getenv("USERS_DB", "users.db"), migrate_from=os.getenv("USERS_JSON", "users.json")).close()
+    # same for the ship snapshot, and a broken ships.json stops here instead of in every shard
+    load_catalog("ships.json")
+
+    shard_count = args.shards or args.processes
+    groups = split_shards(shard_count, args.processes)
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+    def spawn(index):
+        shard_ids = groups[index]
+        print(f"Starting process {index} with shards {shard_ids} of {shard_count}")
+        return subprocess.Popen([sys.executable, main_py], env=child_env(index, shard_count, shard_ids))
+
+    children = {index: spawn(index) for index in range(len(groups))}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while not stopping:
+        time.sleep(1)
+        for index, child in list(children.items()):
+            code = child.poll()
+            if code is None or stopping:
+                continue
+            print(f"Process {index} exited with code {code}, restarting in {args.restart_delay}s")
+            time.sleep(args.restart_delay)
+            children[index] = spawn(index)
+
+    print("Stopping shard processes...")
+    for child in children.values():
+        if child.poll() is None:
+            child.send_signal(signal.SIGINT)
+    for child in children.values():
+        try:
+            child.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            child.kill()
+
+
+if __name__ == "__main__":
+    main()
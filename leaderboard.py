@@ -0,0 +1,86 @@
+from itertools import islice
+
+from sortedcontainers import SortedList
+
+
+class Leaderboard:
+    def __init__(self):
+        self.scores = {}
+        # (-score, user_id) so the best captain sorts first and ties stay stable
+        self.ranked = SortedList()
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, user_id):
+        return user_id in self.scores
+
+    def update(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self.ranked.remove((-old, user_id))
+        self.scores[user_id] = score
+        self.ranked.add((-score, user_id))
+
+    def remove(self, user_id):
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            self.ranked.remove((-old, user_id))
+
+    def bulk_load(self, items):
+        for user_id, score in items:
+            if user_id not in self.scores:
+                self.scores[user_id] = score
+        self.ranked = SortedList((-score, user_id) for user_id, score in self.scores.items())
+
+    def top(self, n=10):
+        return [(user_id, -negative_score) for negative_score, user_id in islice(self.ranked, n)]
+
+    def rank(self, user_id):
+        # 1-based, captains with the same score share a rank
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.ranked.bisect_left((-score,)) + 1
+
+
+BOARDS = {
+    "wins": lambda user: user.wins,
+    "balance": lambda user: user.balance,
+    "fleet": lambda user: user.fleet_size,
+}
+
+
+class Leaderboards:
+    def __init__(self):
+        self.boards = {name: Leaderboard() for name in BOARDS}
+        self.names = {}
+
+    def get(self, name):
+        return self.boards.get(name)
+
+    def name_of(self, user_id):
+        return self.names.get(user_id) or str(user_id)
+
+    def update(self, user_id, user):
+        self.names[user_id] = user.name
+        for name, score in BOARDS.items():
+            self.boards[name].update(user_id, score(user))
+
+    def replace(self, users):
+        boards = {name: Leaderboard() for name in BOARDS}
+        users = list(users)
+        for name, score in BOARDS.items():
+            boards[name].bulk_load((user_id, score(user)) for user_id, user in users)
+        self.boards = boards
+        self.names = {user_id: user.name for user_id, user in users}
+
+    def load(self, users):
+        # users updated by a command while we were loading already hold fresher scores, bulk_load keeps them
+        users = list(users)
+        for name, score in BOARDS.items():
+            self.boards[name].bulk_load((user_id, score(user)) for user_id, user in users)
+        for user_id, user in users:
+            self.names.setdefault(user_id, user.name)
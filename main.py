@@ -1,504 +1,649 @@
 import discord
-from discord.ext import commands, tasks
+from discord import app_commands
+from discord.ext import commands
 import random
 import asyncio
 from dotenv import load_dotenv
 import os
-import json
+import time
+import threading
+from functools import partial
 from datetime import datetime, timedelta
+from user_store import open_user_store
+from ship_catalog import ShipCatalog
+from persistence import Persistence
+from embeds import EmbedCache, parse_shop_filter, build_battle_summary
+from shop_view import ShopView
+from ship_assets import ShipAssets
+from ship_search import ShipIndex
+from spawn_scheduler import SpawnScheduler
+from battle_sessions import BattleSessions
+from encounters import Encounters, NoEncounter, PartyFull
+from metrics import metrics
+from battle import SPAWN_EXCLUDED, TURN_TIMEOUT, RETALIATION_MIN, DEFEND_BOOST_MIN, LOOT_MIN, LOOT_MAX, resolve_battle
+from leaderboard import Leaderboards
+from records import User
+from economy import Economy, NotRegistered, AlreadyRegistered, InsufficientFunds, AlreadyOwned, NotOwned
+from process_locks import FileLockStripes
+from outbound import Outbox
+from cooldowns import Cooldowns, OnCooldown, format_duration
+from purge import PurgeEngine, AlreadyPurging, TooManyPurges
+from command_scheduler import CommandScheduler
+from profiler import SamplingProfiler, command_tags
 
 load_dotenv()
 
-class MyBot(commands.Bot):
-    def __init__(self, command_prefix, intents):
-        super().__init__(command_prefix=command_prefix, intents=intents)
-        self.cat_spawned = False
-        self.channel_ids = []
+# SHARD_COUNT/SHARD_IDS are set by launcher.py when several shard processes share one machine
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv("SHARD_IDS", "").split(",") if shard_id.strip()] or None
+SHARED_STORE = os.getenv("SHARED_STORE") == "1"
+BotBase = commands.AutoShardedBot if SHARD_COUNT or os.getenv("SHARDED") == "1" else commands.Bot
+
+
+def shard_options():
+    if BotBase is commands.Bot:
+        return {}
+    return {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS}
+
+
+class MyBot(BotBase):
+    def __init__(self, command_prefix, intents, **options):
+        super().__init__(command_prefix=command_prefix, intents=intents, **options)
+        self.spawns = SpawnScheduler(
+            self.spawn_in_guild,
+            min_interval=int(os.getenv("SPAWN_MIN_SECONDS", "60")),
+            max_interval=int(os.getenv("SPAWN_MAX_SECONDS", "180")),
+        )
+        self.battles = BattleSessions()
+        # guild id -> ids of the channels a ship can spawn in right now, dropped whenever channels,
+        # roles or our own member change and worked out again at the next spawn
+        self.spawn_channels = {}
+        self.encounters = Encounters(
+            ttl=int(os.getenv("ENCOUNTER_TTL_SECONDS", "600")),
+            max_party=int(os.getenv("ENCOUNTER_PARTY_SIZE", "1")),
+        )
+        self.scheduler = CommandScheduler(
+            max_running=int(os.getenv("COMMANDS_MAX_RUNNING", "64")),
+            per_guild=int(os.getenv("COMMANDS_PER_GUILD", "4")),
+            per_user=int(os.getenv("COMMANDS_PER_USER", "1")),
+            max_queued_per_guild=int(os.getenv("COMMANDS_QUEUE_PER_GUILD", "20")),
+        )
+        self.profile_timer = None
+        metrics.gauge("active_battles", lambda: len(self.battles))
+        metrics.gauge("commands_running", lambda: self.scheduler.running)
+        metrics.gauge("commands_queued", lambda: self.scheduler.queued)
+        metrics.gauge("commands_shed", lambda: self.scheduler.shed)
+        metrics.gauge("encounters", lambda: len(self.encounters))
+        metrics.gauge("guilds", lambda: len(self.guilds))
+
+    async def setup_hook(self):
+        self.catalog_watcher = asyncio.create_task(catalog.watch())
+        self.lag_watcher = asyncio.create_task(metrics.watch_loop_lag())
+        self.metrics_exporter = asyncio.create_task(metrics.export(os.getenv("METRICS_FILE", "metrics.prom")))
+        self.leaderboard_loader = asyncio.create_task(load_leaderboards())
+        self.asset_builder = asyncio.create_task(assets.build())
+        self.cooldown_loader = asyncio.create_task(cooldowns.load())
+        # slash commands only need registering with Discord when they change
+        if os.getenv("SYNC_COMMANDS") == "1":
+            synced = await self.tree.sync()
+            print(f"Synced {len(synced)} slash commands.")
+
+    async def close(self):
+        self.spawns.stop()
+        await purges.close()
+        await outbox.close()
+        await cooldowns.close()
+        await persistence.close()
+        await super().close()
 
     async def on_ready(self):
         print(f'Logged on as: {self.user}')
 
         if not self.guilds:
             print("Bot is not in any guild.")
-            return
 
         for guild in self.guilds:
-            if guild.text_channels:
-                self.channel_ids = [channel.id for channel in guild.text_channels]
-                print(f"Available channels in guild '{guild.name}': {self.channel_ids}")
-                break        
+            self.spawns.add_guild(guild.id)
+        print(f"Scheduling ship spawns for {len(self.guilds)} guilds.")
+
+        self.spawns.start()
 
-        if not self.channel_ids:
-            print("No channels available for spawning the ship.")
+    async def on_message(self, message):
+        if message.author.bot:
+            return
+        if self.battles.route(message):
             return
 
-        self.cat_spawn_loop.start()
-
-    @tasks.loop(seconds=60)
-    async def cat_spawn_loop(self):
-        if not self.cat_spawned and self.channel_ids:
-            spawn_delay = random.randint(0,1)
-            await asyncio.sleep(spawn_delay)
-
-            if not self.cat_spawned:
-                self.cat_spawned = True
-                channel_id = random.choice(self.channel_ids) 
-                channel = self.get_channel(channel_id)
-                if channel:
-                    print(f"Spawning ship in channel {channel_id}")
-                    await spawn_ship(channel.id)  
-                else:
-                    print(f"Failed to get channel {channel_id}")
-            else:
-                print("Ship already spawned, skipping spawn.")
+        ctx = await self.get_context(message)
+        if ctx.command is None:
+            # plain chat, or an unknown command for on_command_error
+            await self.invoke(ctx)
+            return
 
-bot = MyBot(command_prefix='$', intents=discord.Intents.all())
+        guild_key = ctx.guild.id if ctx.guild is not None else ("dm", ctx.author.id)
+        job = self.scheduler.submit(guild_key, ctx.author.id, partial(self.invoke, ctx))
+        if job is None:
+            if self.scheduler.should_reply_busy(guild_key):
+                say(ctx, "🚧 The bot is busy right now, try that again in a moment.")
+            return
+        ctx.command_job = job
 
-def load_users():
-    if os.path.exists('users.json'):
-        with open('users.json', 'r') as file:
-            return json.load(file)
-    return {}
+    async def on_command_error(self, ctx, error):
+        if isinstance(error, OnCooldown):
+            say(ctx, f"⏳ {ctx.author.mention}, `${ctx.command.qualified_name}` is ready in {format_duration(error.remaining)}.")
+            return
+        cooldowns.cancel(ctx)
+        if ctx.command is not None:
+            metrics.record_error(ctx.command.qualified_name)
+        await super().on_command_error(ctx, error)
 
+    async def on_guild_join(self, guild):
+        self.spawns.add_guild(guild.id)
 
+    async def on_guild_remove(self, guild):
+        self.spawns.remove_guild(guild.id)
+        self.forget_spawn_channels(guild.id)
 
+    async def on_guild_channel_create(self, channel):
+        self.forget_spawn_channels(channel.guild.id)
 
-@bot.command()
-async def balance(ctx):
-    user_id = str(ctx.author.name)
+    async def on_guild_channel_delete(self, channel):
+        self.forget_spawn_channels(channel.guild.id)
 
-    try:
-        with open("users.json", "r") as f:
-            users = json.load(f)
-    except FileNotFoundError:
-        users = {}
+    async def on_guild_channel_update(self, before, after):
+        self.forget_spawn_channels(after.guild.id)
 
-    if user_id not in users:
-        await ctx.send("You need to register first. Use `$start` to get started.")
-        return
-    else:
-        balance = users[user_id].get("balance", 0)
-        await ctx.send(f"{ctx.author.mention}, your current balance is {balance} shipoons.")            
+    async def on_guild_role_update(self, before, after):
+        self.forget_spawn_channels(after.guild.id)
 
-@bot.command()
-async def buy(ctx,*,ship_name):
-    user_id = str(ctx.author.name)
+    async def on_guild_role_delete(self, role):
+        self.forget_spawn_channels(role.guild.id)
 
-    try:
-        with open("users.json", "r") as f:
-            users = json.load(f)
-    except FileNotFoundError:
-        users = {}
+    async def on_member_update(self, before, after):
+        if after.id == self.user.id:
+            self.forget_spawn_channels(after.guild.id)
 
-    try:
-        with open("ships.json", "r") as f:
-            ships = json.load(f)
-    except FileNotFoundError:
-        await ctx.send("Ship data not available, try later!")
-        return
+    def forget_spawn_channels(self, guild_id):
+        self.spawn_channels.pop(guild_id, None)
 
-    ship_data = next((ship for ship in ships if ship['ship_name'].lower() == ship_name.lower()), None) 
-    if not ship_data:
-        await ctx.send(f"The ship **{ship_name}** is not available for purchase, sorry!")
-        return
+    def pick_spawn_channel(self, guild):
+        channel_ids = self.spawn_channels.get(guild.id)
+        if channel_ids is None:
+            configured = self.spawns.channels_for(guild.id)
+            if configured:
+                candidates = [guild.get_channel(channel_id) for channel_id in configured]
+            else:
+                candidates = guild.text_channels
+            channel_ids = [channel.id for channel in candidates if channel is not None and channel.permissions_for(guild.me).send_messages]
+            self.spawn_channels[guild.id] = channel_ids
+
+        if not channel_ids:
+            return None
+        channel = guild.get_channel(random.choice(channel_ids))
+        if channel is None:
+            self.forget_spawn_channels(guild.id)
+        return channel
+
+    async def spawn_in_guild(self, guild_id):
+        guild = self.get_guild(guild_id)
+        if guild is None:
+            self.spawns.remove_guild(guild_id)
+            return
 
-    ship_price = None
+        channel = self.pick_spawn_channel(guild)
+        if channel is None:
+            print(f"No channel to spawn a ship in for guild '{guild.name}'.")
+            return
 
-    for stat in ship_data.get("ship_stats", []):
-        if stat["stat_name"] == "Price":
-            ship_price = stat["stat_value"]
-            break
+        await spawn_ship(channel.id)
+
+bot = MyBot(command_prefix='$', intents=discord.Intents.all(), **shard_options())
+
+if SHARED_STORE and os.getenv("USER_STORE", "sqlite") != "sqlite":
+    raise RuntimeError("Shard processes can only share the sqlite user store, unset USER_STORE.")
+
+catalog = ShipCatalog("ships.json", auto_reload=False)
+ship_index = ShipIndex(catalog)
+STARTER_SHIPS = ["Titanic", "USS Constitution", "Queen Mary", "USS Enterprise (CVN-65)", "Queen Mary 2"]
+BEG_COOLDOWN = 3600
+BEG_MIN = 100
+BEG_MAX = 1000
+CONQUER_COOLDOWN = int(os.getenv("CONQUER_COOLDOWN_SECONDS", "60"))
+persistence = Persistence(open_user_store(), catalog, flush_interval=float(os.getenv("FLUSH_INTERVAL", "2")), shared=SHARED_STORE)
+process_locks = FileLockStripes(os.getenv("USERS_DB", "users.db") + ".locks") if SHARED_STORE else None
+economy = Economy(persistence, process_locks=process_locks)
+# per process: with several shard processes a user could get one cooldown per process, beg also checks the user record
+cooldowns = Cooldowns(persistence, flush_interval=float(os.getenv("COOLDOWN_FLUSH_INTERVAL", "5")))
+assets = ShipAssets(catalog)
+embed_cache = EmbedCache(catalog, assets)
+leaderboards = Leaderboards()
+outbox = Outbox(window=float(os.getenv("OUTBOX_WINDOW", "0.1")))
+metrics.gauge("messages_queued", lambda: outbox.queued)
+metrics.gauge("messages_sent", lambda: outbox.sent)
+metrics.gauge("cooldowns_active", lambda: len(cooldowns))
+profiler = SamplingProfiler(interval=float(os.getenv("PROFILE_INTERVAL_MS", "10")) / 1000)
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "120"))
+purges = PurgeEngine(
+    max_jobs_per_guild=int(os.getenv("PURGE_JOBS_PER_GUILD", "2")),
+    single_delete_interval=float(os.getenv("PURGE_DELETE_INTERVAL", "1")),
+)
+metrics.gauge("purge_jobs", lambda: len(purges))
+economy.on_commit(leaderboards.update)
+
+
+async def load_leaderboards():
+    users = await persistence.all()
+    leaderboards.load(users)
+    print(f"Loaded leaderboards for {len(users)} users.")
+
+    # other shard processes change users we never see commits for, rebuild from the shared store now and then
+    while SHARED_STORE:
+        await asyncio.sleep(int(os.getenv("LEADERBOARD_REFRESH_SECONDS", "60")))
+        users = await persistence.all()
+        leaderboards.replace(users)
+
+
+# interaction id -> the last reply queued for it
+interaction_replies = {}
+
+
+async def send_reply(previous, ctx, content, embed, file):
+    # only the first reply can answer the interaction and Discord marks it answered once that call returns,
+    # so every reply waits for the one before it and the rest go out as followups in order
+    if previous is not None:
+        try:
+            await previous
+        except Exception:
+            pass
+    return await ctx.send(content, embed=embed, file=file)
 
-    if ship_price is None:
-        await ctx.send("Could not find the price of the ship, try again later!")
-        return
-    
-    if user_id not in users:
-        users[user_id] = {"balance": 0, "ships": [], "selected_ship": None}
 
-    user_data = users[user_id]    
-    
-    if ship_name in user_data["ships"]:
-        await ctx.send("You already own this ship!")
-        return
-    
-    if user_data["balance"] < ship_price:
-        await ctx.send("You do not have enough shipoons to purchase this ship!")
-        return
-    
-    user_data['balance'] -= ship_price
-    user_data['ships'].append(ship_name)
+def reply_sent(interaction_id, future):
+    if interaction_replies.get(interaction_id) is future:
+        del interaction_replies[interaction_id]
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Failed to reply to interaction {interaction_id}: {future.exception()!r}")
 
-    with open("users.json", "w") as f:
-        json.dump(users, f, indent=4)
 
-    await ctx.send(f"Congratulations! 🥳 {ctx.author.mention}, you have finally purchased this ship, type `$ships` to view your ships!")
-    await ctx.send("Thanks for shopping, please come again too...")
+def say(ctx, content=None, embed=None, file=None):
+    # queued and merged with the other messages going to this channel in the next few ms, not awaited
+    if ctx.interaction is not None:
+        interaction_id = ctx.interaction.id
+        future = asyncio.ensure_future(send_reply(interaction_replies.get(interaction_id), ctx, content, embed, file))
+        interaction_replies[interaction_id] = future
+        future.add_done_callback(partial(reply_sent, interaction_id))
+        return future
+    return outbox.send(ctx.channel, content, embed=embed, file=file)
 
-@bot.command()
-async def shop(ctx):
-    user_id = str(ctx.author.name)
 
-    users = load_users()
+def send_ship(send, ship):
+    # the first message showing a local image uploads it, later ones reuse the attachment url
+    file = assets.file_for(ship)
+    sent = send(embed=embed_cache.ship(ship), file=file)
+    if file is not None:
+        assets.track(ship, sent)
 
-    if user_id not in users:
-        await ctx.send("You need to register first. Use `$start` to get started.")
-        return
-    
-    with open("ships.json", "r") as f:
-        all_ships = json.load(f)
-
-    user_ships = users[user_id].get("ships",[])
-
-    available_ships = [ship for ship in all_ships if ship['ship_name'] not in user_ships]
-
-    if available_ships:
-        embed = discord.Embed(title="Ship Shop", description="Here are the ships available for purchase:", color=discord.Color.green())
-        
-        for ship in available_ships:
-            embed.add_field(name=ship["ship_name"] , value=(
-                    f"Type: {ship['ship_type']}\n"
-                    f"Price: {next(stat['stat_value'] for stat in ship['ship_stats'] if stat['stat_name'] == 'Price')}\n"
-                    f"Description: {ship['ship_description'][:100]}..."  
-                ), inline=False)
-        
-        
-        embed.set_image(url=f"{available_ships[0]['ship_image']}")
-
-        await ctx.send(embed=embed)
-    else:
-        await ctx.send("You own all the ships already!")    
 
-    await ctx.send("Welcome traveller to the shop! The ships you have will not appear on the list to buy!")
+def did_you_mean(ship_name):
+    suggestions = ship_index.search(ship_name, limit=3)
+    if not suggestions:
+        return ""
+    return " Did you mean " + " or ".join(f"**{ship.name}**" for ship in suggestions) + "?"
 
 
+def ship_choices(ships):
+    return [app_commands.Choice(name=ship.name, value=ship.name) for ship in ships]
 
-@bot.command()
-async def select(ctx, *, ship_name):
-    user_id = str(ctx.author.name)
-    try:
-        with open("users.json","r") as f:
-            users = json.load(f)
-    except FileNotFoundError:
-        users = {}
 
-    if user_id in users:
-        user_data = users[user_id]
-        if "ships" in user_data and ship_name in user_data['ships']:
-            user_data['selected_ship'] = ship_name
+async def autocomplete_ship(interaction, current):
+    return ship_choices(ship_index.search(current))
 
-            with open("users.json","w") as f:
-                json.dump(users,f,indent=4)
 
-            await ctx.send(f"{ctx.author.mention}, you have successfully selected **{ship_name}** as your primary ship!")
+async def autocomplete_owned_ship(interaction, current):
+    user = await economy.get(interaction.user.id, interaction.user.name)
+    if user is None:
+        return []
+    ships = ship_index.search(current, limit=100) if current else catalog.ships_in(user.ships)
+    return ship_choices([ship for ship in ships if user.owns(ship.index)][:25])
 
-        else:
-            await ctx.send(f"{ctx.author.mention}, you don't own a ship named **{ship_name}.**")        
-    else:
-        await ctx.send(f"{ctx.author.mention}, you don't have any ships to select.")
 
-def get_ship_stat_value(ship, stat_name):
-    
-    
-    for stat in ship.get("ship_stats", []):
-        if stat["stat_name"].lower() == stat_name.lower():
-            return stat["stat_value"]
-    
-    
-    for weapon in ship.get("ship_weapons", []):
-        if weapon["weapon_name"].lower() == stat_name.lower():
-            return weapon["stat_value"]
-    
-    
-    for module in ship.get("ship_modules", []):
-        if module["module_name"].lower() == stat_name.lower():
-            return module["stat_value"]
-    
-    
-    for defense in ship.get("ship_defense_skills", []):
-        if defense["defense_name"].lower() == stat_name.lower():
-            return defense["stat_value"]
+async def autocomplete_starter_ship(interaction, current):
+    return ship_choices([ship for ship in ship_index.search(current, limit=100) if ship.name in STARTER_SHIPS][:25])
 
 
-def load_ships():
-    try:
-        with open("ships.json", "r") as file:
-            ships = json.load(file)
-            return ships
-    except FileNotFoundError:
-        print("Error: ships.json file not found.")
-        return []
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
 
-def get_ship_stat_value(ship, stat_name):
-    for stat in ship.get("ship_stats", []):
-        if stat["stat_name"].lower() == stat_name.lower():
-            return stat["stat_value"]
-    return 0  
 
+@bot.after_invoke
+async def stop_command_timer(ctx):
+    started_at = getattr(ctx, "started_at", None)
+    if started_at is not None:
+        metrics.observe_command(ctx.command.qualified_name, time.perf_counter() - started_at)
 
-def get_random_ship_attack_value(ship):
-    weapons = ship.get("ship_weapons", [])
-    if not weapons:
-        return 0  
 
-    random_weapon = random.choice(weapons)  
-    weapon_name = random_weapon.get("weapon_name", "Unknown Weapon")
-    weapon_value = random_weapon.get("stat_value", 0)
 
-    print(f"Using weapon: {weapon_name} with attack value: {weapon_value}")
-    return weapon_value, weapon_name
 
+@bot.command()
+async def balance(ctx):
+    user_data = await economy.get(ctx.author.id, ctx.author.name)
 
-def get_ship_defense_value(ship):
-    for defense in ship.get("ship_defense_skills", []):
-        if "stat_value" in defense:
-            return defense["stat_value"]
-    return 0  
+    if user_data is None:
+        say(ctx, "You need to register first. Use `$start` to get started.")
+        return
+    else:
+        balance = user_data.balance
+        say(ctx, f"{ctx.author.mention}, your current balance is {balance} shipoons.")            
 
-async def spawn_ship(channel_id: int):
-    print(f"Spawning ship in channel {channel_id}")  
-    
-    with open('ships.json', 'r') as file:
-        ships = json.load(file)
+@bot.hybrid_command(description="Buy a ship from the shop")
+async def buy(ctx, *, ship_name: str):
+    if not len(catalog):
+        say(ctx, "Ship data not available, try later!")
+        return
 
-    random_ship = random.choice(ships)
+    ship = ship_index.resolve(ship_name)
+    if not ship:
+        say(ctx, f"The ship **{ship_name}** is not available for purchase, sorry!{did_you_mean(ship_name)}")
+        return
 
-    while random_ship.get("ship_name") == "SUPER BATTLE SHIP":
-        random_ship = random.choice(ships)
+    ship_name = ship.name
+    ship_price = ship.price
 
-    bot.spawned_ship = random_ship.get("ship_name")
-    bot.random_spawned_ship = random_ship
+    if ship_price is None:
+        say(ctx, "Could not find the price of the ship, try again later!")
+        return
     
-    embed = discord.Embed(
-        title="Ship Details", 
-        color=discord.Color.purple(),
-        description=f"{random_ship.get('ship_description', 'No description available')}"
-    )
+    try:
+        async with economy.transaction(ctx.author.id, ctx.author.name) as txn:
+            txn.grant_ship(ship)
+            txn.debit(ship_price)
+    except NotRegistered:
+        say(ctx, "You need to register first. Use `$start` to get started.")
+        return
+    except AlreadyOwned:
+        say(ctx, "You already own this ship!")
+        return
+    except InsufficientFunds:
+        say(ctx, "You do not have enough shipoons to purchase this ship!")
+        return
 
-    
-    def format_field(field_data):
-        if not field_data:
-            return "No data available"
+    say(ctx, f"Congratulations! 🥳 {ctx.author.mention}, you have finally purchased this ship, type `$ships` to view your ships!")
+    say(ctx, "Thanks for shopping, please come again too...")
 
-        formatted_data = []
-        for item in field_data:
-            name = item.get('name', item.get('stat_name', item.get('module_name', item.get('defense_name', item.get('weapon_name', 'Unknown')))))
-            value = item.get('value', item.get('stat_value', 'N/A'))
-            formatted_data.append(f"{name}: {value}")
-        return "\n".join(formatted_data)
+@bot.command()
+async def shop(ctx, *, filters: str = ""):
+    user_data = await economy.get(ctx.author.id, ctx.author.name)
 
-    
-    stats_str = format_field(random_ship.get('ship_stats', []))
-    weapons_str = format_field(random_ship.get('ship_weapons', []))
-    modules_str = format_field(random_ship.get('ship_modules', []))
-    defense_str = format_field(random_ship.get('ship_defense_skills', []))
-    
-    embed.add_field(name="Name", value=random_ship.get("ship_name", "Unknown"), inline=False)
-    embed.add_field(name="Type", value=random_ship.get("ship_type", "Unknown"), inline=False)
-    embed.add_field(name="Stats", value=stats_str, inline=False)
-    embed.add_field(name="Weapons", value=weapons_str, inline=False)
-    embed.add_field(name="Modules", value=modules_str, inline=False)
-    embed.add_field(name="Defense skills", value=defense_str, inline=False)
-    embed.set_image(url=f"{random_ship['ship_image']}")
-    
-    file_path = f"ship_images/{random_ship.get('ship_image', '')}"
+    if user_data is None:
+        say(ctx, "You need to register first. Use `$start` to get started.")
+        return
 
-    if os.path.exists(file_path):
-        
-        channel = bot.get_channel(channel_id)
-        if channel:
-            await channel.send( embed=embed)
-        else:
-            print(f"Channel with ID {channel_id} not found.")
+    shop_filter = parse_shop_filter(filters)
+    owned = user_data.ships
+    embed, page_count = embed_cache.shop_page(owned, shop_filter)
+
+    if embed is None:
+        say(ctx, "No ships match that filter, try `$shop` without one." if filters else "You own all the ships already!")
+        return
+
+    if page_count == 1:
+        say(ctx, embed=embed)
     else:
-        channel = bot.get_channel(channel_id)
-        if channel:
-            await channel.send(embed=embed)
-        else:
-            print(f"Channel with ID {channel_id} not found.")
+        # the buttons need the sent message, so this one skips the outbox
+        view = ShopView(embed_cache, owned, shop_filter, ctx.author.id, page_count)
+        view.message = await ctx.send(embed=embed, view=view)
 
-def get_ship_attack_value(ship):
-    return sum(weapon["stat_value"] for weapon in ship.get("ship_weapons", []))
+    say(ctx, "Welcome traveller to the shop! The ships you have will not appear on the list to buy!")
 
 
 
-@bot.command()
-async def start(ctx):
+@bot.hybrid_command(description="Make one of your ships primary")
+async def select(ctx, *, ship_name: str):
+    ship = ship_index.resolve(ship_name)
+    if ship is None:
+        say(ctx, f"{ctx.author.mention}, there is no ship named **{ship_name}.**{did_you_mean(ship_name)}")
+        return
 
-    await ctx.send("🌌 **Welcome back, traveller!** I'm here to guide you on your journey to the stars and beyond. To begin, I'll help you find a worthy ship for your adventures!")
-    await ctx.send("💰 **As a starter reward, you'll receive 30,000 Shipoons, our exclusive currency!**")
+    ship_name = ship.name
+    try:
+        async with economy.transaction(ctx.author.id, ctx.author.name) as txn:
+            txn.select_ship(ship)
+    except NotRegistered:
+        say(ctx, f"{ctx.author.mention}, you don't have any ships to select.")
+    except NotOwned:
+        say(ctx, f"{ctx.author.mention}, you don't own a ship named **{ship_name}.**")
+    else:
+        say(ctx, f"{ctx.author.mention}, you have successfully selected **{ship_name}** as your primary ship!")
 
+def get_random_ship_attack_value(ship):
+    if not ship.weapons:
+        return 0, "Unknown Weapon"
 
-    available_ships = ["Titanic", "USS Constitution", "Queen Mary", "USS Enterprise (CVN-65)", "Queen Mary 2"]
-    await ctx.send("🚢 **Available Starter Ships:**")
-    for index, ship in enumerate(available_ships, start=1):
-        await ctx.send(f"{index}. **{ship}**")
+    weapon_name, weapon_value = random.choice(ship.weapons)
 
+    print(f"Using weapon: {weapon_name} with attack value: {weapon_value}")
+    return weapon_value, weapon_name
 
-    user_id = str(ctx.author.name)
-    try:
-        with open("users.json", "r") as f:
-            users = json.load(f)
-    except FileNotFoundError:
-        users = {}
 
+async def spawn_ship(channel_id: int):
+    print(f"Spawning ship in channel {channel_id}")  
+    
+    ship = catalog.random(exclude=SPAWN_EXCLUDED)
+    if ship is None:
+        print("No ships available to spawn.")
+        return
 
-    if user_id in users:
-        await ctx.send("👀 You are already registered, Captain! Ready to sail the cosmos again?")
+    channel = bot.get_channel(channel_id)
+    if channel:
+        bot.encounters.spawn(channel_id, ship)
+        send_ship(partial(outbox.send, channel), ship)
     else:
+        print(f"Channel with ID {channel_id} not found.")
 
-        users[user_id] = {
-            "balance": 30000,
-            "selected_ship": "",
-            "ships": [],
-            "last_beg": "",
-            "wins": 0,
-            "loses": 0
-        }
-        with open("users.json", "w") as f:
-            json.dump(users, f, indent=4)
 
 
-        await ctx.send("To learn more about any of the ships, use `$info <ship_name>`. When you're ready, use `$select_initial <ship_name>` to choose your starting ship.")
-        await ctx.send("**⚠️ Note:** Choosing your ship is a one-time decision, so select wisely as it cannot be changed later.")
-
 @bot.command()
-async def select_initial(ctx, *, ship_name: str):
+async def start(ctx):
 
-    available_ships = ["Titanic", "USS Constitution", "Queen Mary", "USS Enterprise (CVN-65)", "Queen Mary 2"]
+    say(ctx, "🌌 **Welcome back, traveller!** I'm here to guide you on your journey to the stars and beyond. To begin, I'll help you find a worthy ship for your adventures!")
+    say(ctx, "💰 **As a starter reward, you'll receive 30,000 Shipoons, our exclusive currency!**")
 
 
-    if ship_name.lower() not in [ship.lower() for ship in available_ships]:
-        await ctx.send("⚠️ **Invalid selection!** Please choose a ship from the available list by typing `$start` to view your options.")
-        return
+    say(ctx, "🚢 **Available Starter Ships:**")
+    for index, ship in enumerate(STARTER_SHIPS, start=1):
+        say(ctx, f"{index}. **{ship}**")
+
 
-    user_id = str(ctx.author.name)
     try:
-        with open("users.json", "r") as f:
-            users = json.load(f)
-    except FileNotFoundError:
-        await ctx.send("🚨 **User data not found.** Please begin your journey by typing `$start`.")
-        return
+        async with economy.transaction(ctx.author.id, ctx.author.name) as txn:
+            txn.register(User(ctx.author.id, name=ctx.author.name, balance=30000))
+    except AlreadyRegistered:
+        say(ctx, "👀 You are already registered, Captain! Ready to sail the cosmos again?")
+    else:
+
+        say(ctx, "To learn more about any of the ships, use `$info <ship_name>`. When you're ready, use `$select_initial <ship_name>` to choose your starting ship.")
+        say(ctx, "**⚠️ Note:** Choosing your ship is a one-time decision, so select wisely as it cannot be changed later.")
 
+@bot.hybrid_command(description="Choose your first ship")
+async def select_initial(ctx, *, ship_name: str):
+    ship = ship_index.resolve(ship_name)
 
-    if user_id not in users:
-        await ctx.send("🚨 **Unregistered!** You must register first with `$start` to choose a ship.")
+    if ship is None or ship.name not in STARTER_SHIPS:
+        suggestions = [ship.name for ship in ship_index.search(ship_name, limit=10) if ship.name in STARTER_SHIPS]
+        hint = f" Did you mean **{suggestions[0]}**?" if suggestions else ""
+        say(ctx, f"⚠️ **Invalid selection!** Please choose a ship from the available list by typing `$start` to view your options.{hint}")
         return
 
-    user_data = users[user_id]
-    if user_data["selected_ship"]:
+    ship_name = ship.name
+    already_selected = None
 
-        await ctx.send(f"{ctx.author.mention}, you've already selected **{user_data['selected_ship']}** as your ship, and this decision is final.")
+    try:
+        async with economy.transaction(ctx.author.id, ctx.author.name) as txn:
+            already_selected = txn.require_user().selected_ship
+            if not already_selected:
+                txn.user.selected_ship = ship_name
+                if not txn.owns(ship):
+                    txn.grant_ship(ship)
+    except NotRegistered:
+        say(ctx, "🚨 **Unregistered!** You must register first with `$start` to choose a ship.")
         return
 
+    if already_selected:
 
-    user_data["selected_ship"] = ship_name
-    user_data["ships"].append(ship_name)
-
-    with open("users.json", "w") as f:
-        json.dump(users, f, indent=4)
+        say(ctx, f"{ctx.author.mention}, you've already selected **{already_selected}** as your ship, and this decision is final.")
+        return
 
 
-    await ctx.send(f"🎉 **Congratulations, Captain {ctx.author.mention}!** You've chosen **{ship_name}** as your starting ship. Set your course, and let the adventure begin! 🚢💨")
-    await ctx.send("🌠 **May the stars guide you on this incredible journey.**")
+    say(ctx, f"🎉 **Congratulations, Captain {ctx.author.mention}!** You've chosen **{ship_name}** as your starting ship. Set your course, and let the adventure begin! 🚢💨")
+    say(ctx, "🌠 **May the stars guide you on this incredible journey.**")
 
 
 
 
 @bot.command()
-async def conquer(ctx):
-    username = str(ctx.author.name)
-    users = load_users()
-
-    if username not in users:
-        await ctx.send("🛑 You need to register first. Use `$start` to get started and prepare for your conquest!")
+@cooldowns.command(CONQUER_COOLDOWN)
+async def conquer(ctx, mode: str = None):
+    if mode is not None and mode.lower() != "auto":
+        cooldowns.cancel(ctx)
+        say(ctx, "Usage: `$conquer` to fight turn by turn, or `$conquer auto` to let the battle play out on its own.")
         return
 
-    ships = load_ships()
+    user_data = await economy.get(ctx.author.id, ctx.author.name)
+
+    if user_data is None:
+        cooldowns.cancel(ctx)
+        say(ctx, "🛑 You need to register first. Use `$start` to get started and prepare for your conquest!")
+        return
 
     super_random_no = random.randint(0,1000000)
     if super_random_no>=8999777:
-        await ctx.send("🛳️💨 The ship has disappeared in the fog, sorry!")
+        say(ctx, "🛳️💨 The ship has disappeared in the fog, sorry!")
         return
 
-    user_ship_name = users[username]["selected_ship"]
-    user_ship = next((ship for ship in ships if ship["ship_name"].lower() == user_ship_name.lower()), None)
+    user_ship_name = user_data.selected_ship
+    user_ship = catalog.get(user_ship_name)
 
     if user_ship is None:
-        await ctx.send("⚠️ Couldn't locate your selected ship. Please double-check your selection or register a new ship.")
+        cooldowns.cancel(ctx)
+        say(ctx, "⚠️ Couldn't locate your selected ship. Please double-check your selection or register a new ship.")
         return
 
-    random_ship = bot.random_spawned_ship
+    session = bot.battles.begin(ctx.channel.id, ctx.author.id)
+    if session is None:
+        cooldowns.cancel(ctx)
+        say(ctx, "⚔️ You are already in a battle here, finish it first!")
+        return
 
-    
-    user_attack = get_ship_attack_value(user_ship)
-    user_defense = get_ship_defense_value(user_ship)
-    user_hp = get_ship_stat_value(user_ship, "HP")
+    try:
+        encounter = bot.encounters.claim(ctx.channel.id, ctx.author.id)
+    except NoEncounter:
+        bot.battles.end(session)
+        cooldowns.cancel(ctx)
+        say(ctx, "🌊 There is no enemy ship in this channel right now, wait for one to spawn!")
+        return
+    except PartyFull:
+        bot.battles.end(session)
+        cooldowns.cancel(ctx)
+        say(ctx, "⚔️ Other captains are already fighting this ship, wait for the next one!")
+        return
 
-    enemy_attack = get_ship_attack_value(random_ship)
-    enemy_defense = get_ship_defense_value(random_ship)
-    enemy_hp = get_ship_stat_value(random_ship, "HP")
+    try:
+        if mode is not None:
+            await run_auto_battle(ctx, user_ship, encounter)
+        else:
+            # the battle mostly waits on the captain's replies, it shouldn't hold one of the guild's command slots
+            bot.scheduler.detach(getattr(ctx, "command_job", None))
+            await run_battle(ctx, session, user_ship, encounter)
+    finally:
+        bot.encounters.release(encounter, ctx.author.id)
+        bot.battles.end(session)
+
+
+async def apply_battle_outcome(ctx, encounter, won, loot=0):
+    # the one place a finished battle pays out, for both conquer modes; True when the enemy ship joined the fleet
+    # in a party only the first captain to sink it takes the ship, the rest still get loot
+    first = won and bot.encounters.defeat(encounter)
+    captured = False
+    async with economy.transaction(ctx.author.id, ctx.author.name) as txn:
+        if won:
+            # beating a ship you already own just pays out the loot
+            captured = first and not txn.owns(encounter.ship)
+            if captured:
+                txn.grant_ship(encounter.ship)
+            txn.credit(loot)
+            txn.record_win()
+        else:
+            txn.record_loss()
+    return captured
 
-    await ctx.send(f"🚀 **Battle Begins!** 🚀\n\n**Your Ship:** {user_ship['ship_name']}\n💙 HP: {user_hp}\n🗡️ Attack: {user_attack}\n🛡️ Defense: {user_defense}\n\n**Enemy Ship:** {random_ship['ship_name']}\n💙 HP: {enemy_hp}\n🗡️ Attack: {enemy_attack}\n🛡️ Defense: {enemy_defense}\n\n")
+
+async def run_auto_battle(ctx, user_ship, encounter):
+    # the whole fight in one computation, one transaction and one message
+    enemy = encounter.ship
+    result = resolve_battle(user_ship, enemy, random.getrandbits(32))
+
+    captured = False
+    if result.won or result.lost:
+        captured = await apply_battle_outcome(ctx, encounter, result.won, result.loot)
+
+    say(ctx, ctx.author.mention, embed=build_battle_summary(ctx.author.display_name, user_ship, enemy, result, captured))
+
+
+async def run_battle(ctx, session, user_ship, encounter):
+    random_ship = encounter.ship
+    user_attack = user_ship.attack
+    user_defense = user_ship.defense
+    user_hp = user_ship.hp
+
+    enemy_attack = random_ship.attack
+    enemy_defense = random_ship.defense
+    enemy_hp = random_ship.hp
+
+    say(ctx, f"🚀 **Battle Begins!** 🚀\n\n**Your Ship:** {user_ship.name}\n💙 HP: {user_hp}\n🗡️ Attack: {user_attack}\n🛡️ Defense: {user_defense}\n\n**Enemy Ship:** {random_ship.name}\n💙 HP: {enemy_hp}\n🗡️ Attack: {enemy_attack}\n🛡️ Defense: {enemy_defense}\n\n")
 
     while user_hp > 0 and enemy_hp > 0:
-        await ctx.send("Choose your action:\n1️⃣ **Attack**\n2️⃣ **Defend**\n3️⃣ **Run Away**")
-        
-        def check(m):
-            return m.author == ctx.author and m.content.lower() in ['1', '2', '3']
-        
-        try:
-            user_choice = await bot.wait_for('message', check=check, timeout=30)
-        except TimeoutError:
-            await ctx.send("⏰ You hesitated too long! The enemy seizes the opportunity and attacks!")
-            user_choice = None
+        say(ctx, "Choose your action:\n1️⃣ **Attack**\n2️⃣ **Defend**\n3️⃣ **Run Away**")
 
-        if user_choice:
-            choice = user_choice.content.lower()
+        choice = await bot.battles.next_move(session, timeout=TURN_TIMEOUT)
+        if choice is None:
+            say(ctx, "⏰ You hesitated too long! The enemy seizes the opportunity and attacks!")
 
+        if choice:
             if choice == '1':  
                 damage, weapon_name = get_random_ship_attack_value(user_ship)
-                random_module = random.choice(random_ship["ship_modules"])
-                random_module_name = random_module.get("module_name", "Unknown Module")
+                random_module = random.choice(random_ship.data["ship_modules"])
+                random_module_name = random_module["name"]
 
                 enemy_hp -= damage
-                await ctx.send(f"💥 You fire your **{weapon_name}**, dealing **{damage}** damage to the enemy's **{random_module_name}**! 🎯\n🔻 Enemy HP: {enemy_hp}")
+                say(ctx, f"💥 You fire your **{weapon_name}**, dealing **{damage}** damage to the enemy's **{random_module_name}**! 🎯\n🔻 Enemy HP: {enemy_hp}")
             
             elif choice == '2':  
-                defense_boost = random.randint(5, user_defense)
-                await ctx.send(f"🛡️ You take a defensive stance, boosting your defense by **{defense_boost}**!")
+                defense_boost = random.randint(DEFEND_BOOST_MIN, user_defense)
+                say(ctx, f"🛡️ You take a defensive stance, boosting your defense by **{defense_boost}**!")
                 user_defense += defense_boost
 
             elif choice == '3':  
-                await ctx.send("🏃 You decided to retreat. The battle ends in your escape, but the enemy may return...")
+                say(ctx, "🏃 You decided to retreat. The battle ends in your escape, but the enemy may return...")
                 return
 
             
             if enemy_hp > 0:
-                enemy_damage = random.randint(10, enemy_attack)
+                enemy_damage = random.randint(RETALIATION_MIN, enemy_attack)
                 user_hp -= enemy_damage
-                await ctx.send(f"🔥 The enemy retaliates! You take **{enemy_damage}** damage.\n💔 Your HP: {user_hp}")
+                say(ctx, f"🔥 The enemy retaliates! You take **{enemy_damage}** damage.\n💔 Your HP: {user_hp}")
 
 
         if user_hp <= 0:
-            await ctx.send(f"💀 **{ctx.author.mention}, your ship has been defeated in battle!** 💔")
-            users[username]["wins"] = users[username].get("losses", 0) + 1
-            with open('users.json', 'w') as file:
-                json.dump(users, file, indent=4)
+            say(ctx, f"💀 **{ctx.author.mention}, your ship has been defeated in battle!** 💔")
+            await apply_battle_outcome(ctx, encounter, won=False)
             break
         elif enemy_hp <= 0:
-            if "ships" not in users[username]:
-                users[username]["ships"] = []
-            
-            users[username]["ships"].append(random_ship.get("ship_name"))
-
-            await ctx.send(f"🎉 **{ctx.author.mention}, you have triumphed! The enemy ship is defeated!** 🏆")
-            random_shipoons = random.randint(0, 50000)
-            await ctx.send(f"Congrats! you also looted {random_shipoons} shipoons from their ship too!")
-            users[username]["balance"] = users[username].get("balance", 0) + random_shipoons
-            users[username]["wins"] = users[username].get("wins", 0) + 1
-            with open('users.json', 'w') as file:
-                json.dump(users, file, indent=4)
+            random_shipoons = random.randint(LOOT_MIN, LOOT_MAX)
+            await apply_battle_outcome(ctx, encounter, won=True, loot=random_shipoons)
+
+            say(ctx, f"🎉 **{ctx.author.mention}, you have triumphed! The enemy ship is defeated!** 🏆")
+            say(ctx, f"Congrats! you also looted {random_shipoons} shipoons from their ship too!")
             break
 
 
@@ -508,20 +653,19 @@ async def conquer(ctx):
 async def ships(ctx):
     
 
-    user_id = str(ctx.author.name)
-    users = load_users()
+    user_data = await economy.get(ctx.author.id, ctx.author.name)
 
     
 
-    if user_id not in users:
-        await ctx.send("You need to register first, please type `$start` to get started.")
+    if user_data is None:
+        say(ctx, "You need to register first, please type `$start` to get started.")
         return 
 
     
 
-    user_ships = users[user_id].get("ships",[])
+    user_ships = catalog.names_of(user_data.ships)
     if not user_ships:
-        await ctx.send("You currently have no ships, please use `$start` and then `$select <ship_name>` from the available early ships to get started.")
+        say(ctx, "You currently have no ships, please use `$start` and then `$select <ship_name>` from the available early ships to get started.")
         return
     
     
@@ -532,77 +676,191 @@ async def ships(ctx):
         embed.add_field(name=ship, value="", inline=False)
 
 
-    await ctx.send(embed=embed)        
+    say(ctx, embed=embed)        
 
 
 
 
 @bot.command()
+@cooldowns.command(BEG_COOLDOWN)
 async def beg(ctx):
-    username = str(ctx.author.name)
-    users = load_users()
-    if username in users:
-        if "last_beg" in users[username]:
-            last_beg = datetime.fromisoformat(users[username]["last_beg"])
-            if datetime.now() - last_beg < timedelta(hours=1):
-                await ctx.send("You can beg for more shipoons in 1 hour.")
-                return
+    amount = random.randint(BEG_MIN, BEG_MAX)
+    ready_at = None
+
+    try:
+        async with economy.transaction(ctx.author.id, ctx.author.name) as txn:
+            # the record decides, it also sees begs made through other shard processes
+            last_beg = txn.require_user().last_beg
+            if last_beg:
+                ready_at = datetime.fromisoformat(last_beg) + timedelta(seconds=BEG_COOLDOWN)
+            if ready_at is None or ready_at <= datetime.now():
+                ready_at = None
+                txn.user.last_beg = datetime.now().isoformat()
+                txn.credit(amount)
+    except NotRegistered:
+        cooldowns.cancel(ctx)
+        say(ctx, "You need to register first. Use `$start` to get started.")
+        return
+
+    if ready_at is not None:
+        remaining = (ready_at - datetime.now()).total_seconds()
+        cooldowns.start(ctx.cooldown_key, remaining)
+        say(ctx, f"⏳ {ctx.author.mention}, `$beg` is ready in {format_duration(remaining)}.")
+        return
+
+    say(ctx, f"🙏 A passing captain takes pity on you, {ctx.author.mention}, and tosses you **{amount}** shipoons.")
+
+async def report_purge(job):
+    channel = job.channel
+    if job.state == "running":
+        text = f"🧹 Purging {channel.mention}... **{job.deleted}** messages deleted so far, `$purge stop` to cancel."
+        if job.status_message is None:
+            job.status_message = await channel.send(text)
+        else:
+            await job.status_message.edit(content=text)
+        return
+
+    if job.state == "done":
+        embed = discord.Embed(title="Purge", description=f"Successfully purged {job.deleted} messages in {channel.mention}.", color=discord.Color.green())
+    elif job.state == "cancelled":
+        embed = discord.Embed(title="Purge", description=f"Purge cancelled after {job.deleted} messages in {channel.mention}.", color=discord.Color.orange())
+    else:
+        embed = discord.Embed(title="Purge", description=f"Purge stopped after {job.deleted} messages: {job.error}", color=discord.Color.red())
+
+    if job.status_message is None:
+        await channel.send(embed=embed, delete_after=3)
+    else:
+        await job.status_message.edit(content=None, embed=embed, delete_after=3)
 
 @bot.command()
-async def purge(ctx, limit: str):
-    if ctx.author.guild_permissions.administrator:
-        if limit == "all":
-            await ctx.channel.purge()
-            embed = discord.Embed(title="Purge", description=f"Successfully purged all messages in {ctx.channel.mention} by {ctx.author.display_name}.", color=discord.Color.green(), timestamp=ctx.message.created_at)
-            await ctx.send(embed=embed, delete_after=3)
-            
-        else:     
-            await ctx.channel.purge(limit=int(limit))
-            embed = discord.Embed(title="Purge", description=f"Successfully purged {limit} messages in {ctx.channel.mention} by {ctx.author.display_name}.", color=discord.Color.green(), timestamp=ctx.message.created_at)
-            await ctx.send(embed=embed, delete_after=3)
+@commands.guild_only()
+async def purge(ctx, limit: str = None):
+    if not ctx.author.guild_permissions.administrator:
+        say(ctx, "Sorry!, but you do not have the permission.")
+        return
+
+    if limit in ("stop", "cancel"):
+        if not purges.cancel(ctx.channel.id):
+            say(ctx, "Nothing is being purged in this channel.")
+        return
+
+    if limit == "all":
+        count = None
+    elif limit is not None and limit.isdigit() and int(limit) > 0:
+        count = int(limit)
     else:
-        await ctx.send("Sorry!, but you do not have the permission.")
+        say(ctx, "Usage: `$purge <number>`, `$purge all` or `$purge stop`.")
+        return
+
+    # runs in the background, newest first from the command itself; the progress message is newer so it survives
+    try:
+        purges.start(ctx.channel, count, discord.Object(id=ctx.message.id + 1), report_purge)
+    except AlreadyPurging:
+        say(ctx, "This channel is already being purged, `$purge stop` to cancel it.")
+    except TooManyPurges:
+        say(ctx, f"Only {purges.max_jobs_per_guild} purges can run in a server at once, try again when one finishes.")
 
 @bot.command()
-async def info(ctx, *, ship_name=None):
-    if not ship_name:
-        await ctx.send("Please provide a ship name to look up.")
-        return
-
-    with open('ships.json', 'r') as file:
-        ships = json.load(file)
-
-    for ship in ships:
-        if ship.get("ship_name", "").lower() == ship_name.lower():
-            embed = discord.Embed(
-                title="Ship Details",
-                color=discord.Color.purple(),
-                description=ship.get("ship_description", "No description available")
-            )
-
-            def format_field(field_data):
-                if not field_data:
-                    return "No data available"
-                return "\n".join(f"{item.get('name', item.get('stat_name', item.get('module_name', item.get('defense_name', item.get('weapon_name', 'Unknown')))))}: {item.get('value', item.get('stat_value', 'N/A'))}" for item in field_data)
-
-            embed.add_field(name="Name", value=ship.get("ship_name", "Unknown"), inline=False)
-            embed.add_field(name="Type", value=ship.get("ship_type", "Unknown"), inline=False)
-            embed.add_field(name="Stats", value=format_field(ship.get("ship_stats", [])), inline=False)
-            embed.add_field(name="Weapons", value=format_field(ship.get("ship_weapons", [])), inline=False)
-            embed.add_field(name="Modules", value=format_field(ship.get("ship_modules", [])), inline=False)
-            embed.add_field(name="Defense Skills", value=format_field(ship.get("ship_defense_skills", [])), inline=False)
-            embed.set_image(url=f"{ship['ship_image']}")
-    
+@commands.guild_only()
+async def spawnchannel(ctx, action: str = "list"):
+    if not ctx.author.guild_permissions.administrator:
+        say(ctx, "Sorry!, but you do not have the permission.")
+        return
 
-            file_path = f"ship_images/{ship.get('ship_image', '')}"
-            if os.path.exists(file_path):
-            
-                await ctx.send( embed=embed)
-            else:
-                await ctx.send(embed=embed)
-            break
+    if action == "add":
+        await bot.spawns.add_channel(ctx.guild.id, ctx.channel.id)
+        bot.forget_spawn_channels(ctx.guild.id)
+        say(ctx, f"Ships will now spawn in {ctx.channel.mention}.")
+    elif action == "remove":
+        await bot.spawns.remove_channel(ctx.guild.id, ctx.channel.id)
+        bot.forget_spawn_channels(ctx.guild.id)
+        say(ctx, f"Ships will no longer spawn in {ctx.channel.mention}.")
     else:
-        await ctx.send(f"Ship with name '{ship_name}' not found.")
+        channel_ids = bot.spawns.channels_for(ctx.guild.id)
+        if channel_ids:
+            say(ctx, "Ships spawn in: " + ", ".join(f"<#{channel_id}>" for channel_id in channel_ids))
+        else:
+            say(ctx, "No spawn channels set, ships spawn in any channel I can talk in. Use `$spawnchannel add` in a channel to limit them.")
+
+@bot.command()
+async def leaderboard(ctx, board: str = "wins"):
+    ranking = leaderboards.get(board.lower())
+    if ranking is None:
+        say(ctx, "Pick a leaderboard: `$leaderboard wins`, `$leaderboard balance` or `$leaderboard fleet`.")
+        return
+
+    units = {"wins": "wins", "balance": "shipoons", "fleet": "ships"}[board.lower()]
+    embed = discord.Embed(title=f"🏆 Top captains by {board.lower()}", color=discord.Color.gold())
+
+    lines = [f"**#{ranking.rank(user_id)}** {leaderboards.name_of(user_id)} — {score} {units}" for user_id, score in ranking.top(10)]
+    embed.description = "\n".join(lines) if lines else "No captains yet, use `$start` to be the first!"
+
+    rank = ranking.rank(ctx.author.id)
+    if rank is not None:
+        embed.set_footer(text=f"Your rank: #{rank} of {len(ranking)}")
+
+    say(ctx, embed=embed)
+
+@bot.command()
+@commands.guild_only()
+async def stats(ctx):
+    if not ctx.author.guild_permissions.administrator:
+        say(ctx, "Sorry!, but you do not have the permission.")
+        return
+
+    say(ctx, f"```\n{metrics.summary()}\n```")
+
+async def profile_until(channel, seconds):
+    # `$profile stop` cancels the wait, either way the samples end up in a file
+    try:
+        await asyncio.sleep(seconds)
+    except asyncio.CancelledError:
+        pass
+    path = os.path.join(os.getenv("PROFILE_DIR", "profiles"), time.strftime("profile-%Y%m%d-%H%M%S.folded"))
+    samples = await profiler.stop(path)
+    outbox.send(channel, f"🔬 Profile written to `{path}` ({samples} samples), feed it to flamegraph.pl or speedscope.")
+
+@bot.command()
+@commands.guild_only()
+async def profile(ctx, action: str = None):
+    if not ctx.author.guild_permissions.administrator:
+        say(ctx, "Sorry!, but you do not have the permission.")
+        return
+
+    active = bot.profile_timer is not None and not bot.profile_timer.done() and not profiler.stopping.is_set()
+    if action == "start":
+        if active or not profiler.start(threading.get_ident(), command_tags(bot), PROFILE_MAX_SECONDS):
+            say(ctx, "A profile is already running, `$profile stop` to finish it.")
+            return
+        bot.profile_timer = asyncio.create_task(profile_until(ctx.channel, PROFILE_MAX_SECONDS))
+        say(ctx, f"🔬 Profiling the bot for up to {PROFILE_MAX_SECONDS}s, `$profile stop` to finish early.")
+    elif action == "stop":
+        if not active:
+            say(ctx, "No profile is running, `$profile start` to begin one.")
+            return
+        bot.profile_timer.cancel()
+    else:
+        say(ctx, "Usage: `$profile start` or `$profile stop`.")
+
+@bot.hybrid_command(description="Look up a ship")
+async def info(ctx, *, ship_name: str = None):
+    if not ship_name:
+        say(ctx, "Please provide a ship name to look up.")
+        return
+
+    ship = ship_index.resolve(ship_name)
+    if not ship:
+        say(ctx, f"Ship with name '{ship_name}' not found.{did_you_mean(ship_name)}")
+        return
+
+    send_ship(partial(say, ctx), ship)
+
+buy.autocomplete("ship_name")(autocomplete_ship)
+info.autocomplete("ship_name")(autocomplete_ship)
+select.autocomplete("ship_name")(autocomplete_owned_ship)
+select_initial.autocomplete("ship_name")(autocomplete_starter_ship)
+
+if __name__ == "__main__":
+    token = os.getenv('DISCORD_TOKEN')
+    bot.run(token)
 
-token = os.getenv('DISCORD_TOKEN')
-bot.run(token)
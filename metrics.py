@@ -0,0 +1,168 @@
+import asyncio
+import bisect
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "lock")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        # I/O timings are recorded from executor threads
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation, good enough to spot a slow path
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def prometheus_lines(self, name, labels=""):
+        lines = []
+        cumulative = 0
+        separator = "," if labels else ""
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.commands = {}
+        self.errors = Counter()
+        self.io = {}
+        self.loop_lag = Histogram()
+        self.last_loop_lag = 0.0
+        self.gauges = {}
+        self.started = time.time()
+
+    def observe_command(self, name, seconds):
+        histogram = self.commands.get(name)
+        if histogram is None:
+            histogram = self.commands[name] = Histogram()
+        histogram.observe(seconds)
+
+    def record_error(self, name):
+        self.errors[name] += 1
+
+    def observe_io(self, name, seconds):
+        histogram = self.io.get(name)
+        if histogram is None:
+            histogram = self.io.setdefault(name, Histogram())
+        histogram.observe(seconds)
+
+    @contextmanager
+    def time_io(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_io(name, time.perf_counter() - started)
+
+    def timed(self, name, func):
+        def wrapper(*args, **kwargs):
+            with self.time_io(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def gauge(self, name, func):
+        self.gauges[name] = func
+
+    async def watch_loop_lag(self, interval=0.5):
+        # how late the loop wakes us up is how long something else kept it busy
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            self.last_loop_lag = max(0.0, time.perf_counter() - expected)
+            self.loop_lag.observe(self.last_loop_lag)
+
+    def render_prometheus(self):
+        lines = [
+            "# TYPE shiproyale_command_latency_seconds histogram",
+        ]
+        for name, histogram in sorted(self.commands.items()):
+            lines += histogram.prometheus_lines("shiproyale_command_latency_seconds", f'command="{name}"')
+
+        lines.append("# TYPE shiproyale_command_errors_total counter")
+        for name, count in sorted(self.errors.items()):
+            lines.append(f'shiproyale_command_errors_total{{command="{name}"}} {count}')
+
+        lines.append("# TYPE shiproyale_io_seconds histogram")
+        for name, histogram in sorted(self.io.items()):
+            lines += histogram.prometheus_lines("shiproyale_io_seconds", f'op="{name}"')
+
+        lines.append("# TYPE shiproyale_event_loop_lag_seconds histogram")
+        lines += self.loop_lag.prometheus_lines("shiproyale_event_loop_lag_seconds")
+
+        for name, func in sorted(self.gauges.items()):
+            lines.append(f"# TYPE shiproyale_{name} gauge")
+            lines.append(f"shiproyale_{name} {func()}")
+
+        lines.append("# TYPE shiproyale_uptime_seconds gauge")
+        lines.append(f"shiproyale_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path, text):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    async def export(self, path, interval=15):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.write_file, path, self.render_prometheus())
+            except OSError as e:
+                print(f"Could not write metrics to {path}: {e}")
+
+    def summary(self, limit=10):
+        lines = ["command      count  errors   p50 ms   p99 ms"]
+        busiest = sorted(self.commands.items(), key=lambda item: item[1].count, reverse=True)[:limit]
+        for name, histogram in busiest:
+            lines.append(f"{name:<12}{histogram.count:>6}{self.errors[name]:>8}"
+                         f"{histogram.quantile(0.5) * 1000:>9.1f}{histogram.quantile(0.99) * 1000:>9.1f}")
+
+        if self.io:
+            lines.append("")
+            lines.append("io           count   p50 ms   p99 ms")
+            for name, histogram in sorted(self.io.items()):
+                lines.append(f"{name:<12}{histogram.count:>6}"
+                             f"{histogram.quantile(0.5) * 1000:>9.1f}{histogram.quantile(0.99) * 1000:>9.1f}")
+
+        lines.append("")
+        lines.append(f"loop lag: last {self.last_loop_lag * 1000:.1f} ms, p99 {self.loop_lag.quantile(0.99) * 1000:.1f} ms")
+        for name, func in sorted(self.gauges.items()):
+            lines.append(f"{name}: {func()}")
+        return "\n".join(lines)
+
+
+metrics = Metrics()
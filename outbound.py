@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+MAX_CONTENT = 2000
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+
+def split_text(text, limit=MAX_CONTENT):
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        yield text[:cut]
+        text = text[cut:].lstrip("\n")
+    if text:
+        yield text
+
+
+def pack(parts):
+    # merge queued (content, embed, file, future) parts into as few messages as the limits allow, keeping their order
+    messages = []
+    content, content_len, embeds, embed_chars, futures = [], 0, [], 0, []
+    files = []
+
+    def finish():
+        if content or embeds or files:
+            messages.append(("\n".join(content), list(embeds), list(files), list(futures)))
+        content.clear()
+        embeds.clear()
+        files.clear()
+        futures.clear()
+
+    for text, embed, file, future in parts:
+        # a part with a file gets a message of its own, its future then resolves to the message holding the upload
+        if file is not None:
+            finish()
+            content_len = 0
+            embed_chars = 0
+
+        if text:
+            for chunk in split_text(str(text)):
+                # text after an embed would render above it, so it starts a new message
+                if embeds or (content and content_len + 1 + len(chunk) > MAX_CONTENT):
+                    finish()
+                    content_len = 0
+                    embed_chars = 0
+                content_len += len(chunk) + (1 if content else 0)
+                content.append(chunk)
+
+        if embed is not None:
+            size = len(embed)
+            if len(embeds) >= MAX_EMBEDS or (embeds and embed_chars + size > MAX_EMBED_CHARS):
+                finish()
+                content_len = 0
+                embed_chars = 0
+            embeds.append(embed)
+            embed_chars += size
+
+        futures.append(future)
+
+        if file is not None:
+            files.append(file)
+            finish()
+            content_len = 0
+            embed_chars = 0
+
+    finish()
+    return messages
+
+
+class ChannelOutbox:
+    def __init__(self, outbox, channel):
+        self.outbox = outbox
+        self.channel = channel
+        self.parts = []
+        self.task = None
+        self.tokens = float(outbox.rate)
+        self.updated = time.monotonic()
+
+    @property
+    def idle(self):
+        return not self.parts and (self.task is None or self.task.done()) and time.monotonic() - self.updated > self.outbox.per
+
+    def wake(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def take_token(self):
+        # per-channel message bucket, Discord allows `rate` messages per `per` seconds on this route
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.outbox.rate, self.tokens + (now - self.updated) * self.outbox.rate / self.outbox.per)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) * self.outbox.per / self.outbox.rate)
+
+    async def run(self, wait=True):
+        if wait:
+            await asyncio.sleep(self.outbox.window)
+
+        while self.parts:
+            parts, self.parts = self.parts, []
+            for content, embeds, files, futures in pack(parts):
+                await self.take_token()
+                kwargs = {}
+                if content:
+                    kwargs["content"] = content
+                if embeds:
+                    kwargs["embeds"] = embeds
+                if files:
+                    kwargs["files"] = files
+
+                message = None
+                try:
+                    message = await self.channel.send(**kwargs)
+                    self.outbox.sent += 1
+                except Exception as e:
+                    print(f"Failed to send to channel {self.channel.id}: {e}")
+
+                for future in futures:
+                    if not future.done():
+                        future.set_result(message)
+
+
+class Outbox:
+    def __init__(self, window=0.1, rate=5, per=5.0):
+        self.window = window
+        self.rate = rate
+        self.per = per
+        self.channels = {}
+        self.queued = 0
+        self.sent = 0
+
+    def send(self, channel, content=None, embed=None, file=None):
+        # returns a future for the message that carried this part, callers usually don't wait for it
+        outbox = self.channels.get(channel.id)
+        if outbox is None:
+            if len(self.channels) > 4096:
+                self.prune()
+            outbox = self.channels[channel.id] = ChannelOutbox(self, channel)
+
+        future = asyncio.get_running_loop().create_future()
+        outbox.parts.append((content, embed, file, future))
+        self.queued += 1
+        outbox.wake()
+        return future
+
+    def prune(self):
+        for channel_id in [channel_id for channel_id, outbox in self.channels.items() if outbox.idle]:
+            del self.channels[channel_id]
+
+    async def close(self):
+        for outbox in list(self.channels.values()):
+            if outbox.task is not None and not outbox.task.done():
+                await outbox.task
+            await outbox.run(wait=False)
@@ -0,0 +1,118 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from delayed_flush import DelayedFlush
+from metrics import metrics
+from records import User
+
+
+class Persistence:
+    # User records keyed by Discord ID in memory, plain dicts keyed by str(ID) in the store
+    def __init__(self, store, catalog, flush_interval=2.0, max_cached=50000, shared=False):
+        self.store = store
+        self.catalog = catalog
+        # shared: other processes write the same store, so never trust the cache and write through on commit
+        self.shared = shared
+        self.flush_interval = flush_interval
+        self.max_cached = max_cached
+        self.cache = OrderedDict()
+        self.dirty = set()
+        # ids taken out of dirty by a flush that hasn't finished, they can't be evicted either
+        self.flushing = set()
+        self.flusher = DelayedFlush(self.write_dirty, flush_interval, "user data")
+        # a single thread keeps the writes in order and the store never sees two callers at once
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persistence")
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def encode(self, record):
+        return record.to_dict(self.catalog)
+
+    def decode(self, user_id, data):
+        return User.from_dict(user_id, data, self.catalog) if data is not None else None
+
+    async def load(self, user_id, name=None):
+        key = str(user_id)
+        data = await self.run(metrics.timed("users_read", self.store.get), key)
+        if data is None and name:
+            data = await self.run(metrics.timed("users_claim", self.store.claim_legacy), key, name)
+        return self.decode(user_id, data)
+
+    async def get(self, user_id, name=None):
+        # name finds the user's record from before records were keyed by ID
+        if self.shared:
+            return await self.load(user_id, name)
+
+        record = self.cache.get(user_id)
+        if record is not None:
+            self.cache.move_to_end(user_id)
+            return record
+
+        record = await self.load(user_id, name)
+
+        # someone else may have loaded or written it while we were waiting
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return cached
+        if record is not None:
+            self.remember(user_id, record)
+        return record
+
+    async def commit(self, user_id, record):
+        if self.shared:
+            await self.run(metrics.timed("users_write", self.store.put_many), [(str(user_id), self.encode(record))])
+        else:
+            self.put(user_id, record)
+
+    def put(self, user_id, record):
+        self.remember(user_id, record)
+        self.dirty.add(user_id)
+        self.flusher.schedule()
+
+    def remember(self, user_id, record):
+        self.cache[user_id] = record
+        self.cache.move_to_end(user_id)
+
+        # evict from the old end, unsaved records go back to the new end and are looked at once at most
+        checked = 0
+        while len(self.cache) > self.max_cached and checked < len(self.cache):
+            old_id, old_record = self.cache.popitem(last=False)
+            checked += 1
+            if old_id in self.dirty or old_id in self.flushing or old_id == user_id:
+                self.cache[old_id] = old_record
+
+    async def flush(self):
+        await self.flusher.flush()
+
+    async def write_dirty(self):
+        if not self.dirty:
+            return
+
+        user_ids = self.dirty
+        self.dirty = set()
+        self.flushing = user_ids
+        batch = [(str(user_id), self.encode(self.cache[user_id])) for user_id in user_ids]
+
+        try:
+            await self.run(metrics.timed("users_write", self.store.put_many), batch)
+        except Exception:
+            self.dirty |= user_ids
+            raise
+        finally:
+            self.flushing = set()
+
+    async def all(self):
+        # records not yet moved to their owner's ID are left out until that user shows up
+        def load():
+            return [(int(key), self.decode(int(key), data)) for key, data in self.store.all() if key.isdigit()]
+        return await self.run(load)
+
+    async def close(self):
+        if self.flusher.closed:
+            return
+        await self.flusher.close()
+        await self.run(self.store.close)
+        self.executor.shutdown(wait=True)
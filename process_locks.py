@@ -0,0 +1,58 @@
+import asyncio
+import errno
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Locks shared between shard processes on one machine, built on fcntl record locks.
+# They are held per process: inside a process the asyncio locks in economy.py decide who goes first.
+
+
+class FileLockStripes:
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError("Running several shard processes needs fcntl file locks (Linux or macOS).")
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def try_acquire(self, stripe):
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, stripe)
+            return True
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                return False
+            raise
+
+    async def acquire(self, stripe):
+        # never a blocking wait: the kernel sees all our coroutines as one lock owner and would
+        # report two of them waiting on each other's stripes as a deadlock
+        delay = 0.001
+        while not self.try_acquire(stripe):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def release(self, stripe):
+        fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, stripe)
+
+    def close(self):
+        os.close(self.fd)
+
+
+@contextmanager
+def file_lock(path):
+    if fcntl is None:
+        yield
+        return
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.lockf(fd, fcntl.LOCK_UN)
+        os.close(fd)
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+IDLE_FUNCTIONS = {"select", "poll", "epoll", "_run_once"}
+
+
+class SamplingProfiler:
+    # a background thread that looks at the event loop thread's stack every `interval` seconds and counts
+    # each stack it sees, tagged with the command running at the time; written as collapsed stacks
+    # ("tag;outer;...;inner count" per line) for flamegraph.pl, speedscope or inferno
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.labels = {}
+        self.tags = {}
+        self.thread = None
+        self.stopping = threading.Event()
+        self.started = None
+        self.sampled = 0
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, thread_id, tags, duration):
+        # tags maps a command callback's code object to the command's name
+        if self.running:
+            return False
+        self.samples = Counter()
+        self.tags = tags
+        self.sampled = 0
+        self.started = time.monotonic()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, args=(thread_id, duration), name="profiler", daemon=True)
+        self.thread.start()
+        return True
+
+    def run(self, thread_id, duration):
+        deadline = time.monotonic() + duration
+        while not self.stopping.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                self.sample(frame)
+
+    def label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self.labels[code] = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def sample(self, frame):
+        stack = []
+        tag = None
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(self.label(code))
+            # the innermost command frame wins, a command awaiting another command's callback is tagged by the inner one
+            if tag is None:
+                tag = self.tags.get(code)
+            frame = frame.f_back
+        if tag is None:
+            tag = "(idle)" if stack and stack[0].split(" ", 1)[0].rsplit(".", 1)[-1] in IDLE_FUNCTIONS else "(loop)"
+
+        stack.append(tag)
+        stack.reverse()
+        self.samples[";".join(stack)] += 1
+        self.sampled += 1
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    async def stop(self, path):
+        # stops sampling (if the time limit hasn't already) and writes what was collected
+        loop = asyncio.get_running_loop()
+        self.stopping.set()
+        if self.thread is not None:
+            await loop.run_in_executor(None, self.thread.join)
+        self.thread = None
+        await loop.run_in_executor(None, self.write, path)
+        return self.sampled
+
+
+def command_tags(bot):
+    return {command.callback.__code__: command.qualified_name for command in bot.walk_commands()}
@@ -0,0 +1,143 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import discord
+
+# Discord bulk-deletes at most 100 messages per call and only ones younger than 14 days
+BULK_LIMIT = 100
+BULK_MAX_AGE = timedelta(days=14) - timedelta(minutes=5)
+
+
+class PurgeError(Exception):
+    pass
+
+
+class AlreadyPurging(PurgeError):
+    pass
+
+
+class TooManyPurges(PurgeError):
+    pass
+
+
+class PurgeJob:
+    def __init__(self, channel, limit, before, on_update):
+        self.channel = channel
+        self.limit = limit
+        self.before = before
+        self.on_update = on_update
+        # running, done, cancelled or failed
+        self.state = "running"
+        self.error = None
+        self.deleted = 0
+        self.started = time.monotonic()
+        self.last_update = 0
+        self.task = None
+        # for on_update to keep its progress message in
+        self.status_message = None
+
+
+class PurgeEngine:
+    # one background task per purge, at most max_jobs_per_guild at a time in a guild and one per channel
+    def __init__(self, max_jobs_per_guild=2, single_delete_interval=1.0, progress_interval=5.0):
+        self.max_jobs_per_guild = max_jobs_per_guild
+        self.single_delete_interval = single_delete_interval
+        self.progress_interval = progress_interval
+        self.jobs = {}
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def jobs_in(self, guild_id):
+        return sum(1 for job in self.jobs.values() if job.channel.guild.id == guild_id)
+
+    def start(self, channel, limit, before, on_update):
+        # limit None purges everything older than `before`
+        if channel.id in self.jobs:
+            raise AlreadyPurging(channel.id)
+        if self.jobs_in(channel.guild.id) >= self.max_jobs_per_guild:
+            raise TooManyPurges(channel.guild.id)
+
+        job = PurgeJob(channel, limit, before, on_update)
+        self.jobs[channel.id] = job
+        job.task = asyncio.get_running_loop().create_task(self.run(job))
+        return job
+
+    def cancel(self, channel_id):
+        job = self.jobs.get(channel_id)
+        if job is None:
+            return False
+        job.task.cancel()
+        return True
+
+    async def update(self, job, force=False):
+        now = time.monotonic()
+        if not force and now - job.last_update < self.progress_interval:
+            return
+        job.last_update = now
+        try:
+            await job.on_update(job)
+        except Exception as e:
+            print(f"Failed to report purge progress in channel {job.channel.id}: {e}")
+
+    async def bulk_delete(self, job, batch):
+        await job.channel.delete_messages(batch)
+        job.deleted += len(batch)
+        await self.update(job)
+
+    async def single_delete(self, job, message):
+        try:
+            await message.delete()
+            job.deleted += 1
+        except discord.NotFound:
+            pass
+        await self.update(job)
+        # old messages can't be bulk deleted, pace them so the purge doesn't live on the rate limiter
+        await asyncio.sleep(self.single_delete_interval)
+
+    async def run(self, job):
+        await self.update(job, force=True)
+        cutoff = discord.utils.utcnow() - BULK_MAX_AGE
+        batch = []
+        try:
+            # history() pages 100 messages at a time, newest first, so at most one page and one batch are held
+            async for message in job.channel.history(limit=job.limit, before=job.before):
+                if message.created_at > cutoff:
+                    batch.append(message)
+                    if len(batch) == BULK_LIMIT:
+                        await self.bulk_delete(job, batch)
+                        batch = []
+                    continue
+
+                # everything from here on is older
+                if batch:
+                    await self.bulk_delete(job, batch)
+                    batch = []
+                await self.single_delete(job, message)
+
+            if batch:
+                await self.bulk_delete(job, batch)
+            job.state = "done"
+        except asyncio.CancelledError:
+            job.state = "cancelled"
+        except discord.Forbidden:
+            job.state = "failed"
+            job.error = "I need the Manage Messages and Read Message History permissions here."
+        except discord.HTTPException as e:
+            job.state = "failed"
+            job.error = str(e)
+        except Exception as e:
+            print(f"Purge in channel {job.channel.id} failed: {e!r}")
+            job.state = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.jobs.pop(job.channel.id, None)
+
+        await self.update(job, force=True)
+
+    async def close(self):
+        tasks = [job.task for job in self.jobs.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
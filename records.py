@@ -0,0 +1,71 @@
+def iter_bits(bits):
+    # indices of the set bits, lowest first
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class User:
+    # ships is a bitset over catalog indices (see ShipCatalog.intern), on disk it stays a list of names
+    __slots__ = ("user_id", "name", "balance", "selected_ship", "ships", "last_beg", "wins", "loses")
+
+    def __init__(self, user_id, name="", balance=0, selected_ship="", ships=0, last_beg="", wins=0, loses=0):
+        self.user_id = user_id
+        self.name = name
+        self.balance = balance
+        self.selected_ship = selected_ship
+        self.ships = ships
+        self.last_beg = last_beg
+        self.wins = wins
+        self.loses = loses
+
+    def values(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, User) and self.values() == other.values()
+
+    def __repr__(self):
+        return f"User({self.user_id}, {self.name!r})"
+
+    def copy(self):
+        return User(*self.values())
+
+    def owns(self, index):
+        return bool(self.ships >> index & 1)
+
+    def add_ship(self, index):
+        self.ships |= 1 << index
+
+    @property
+    def fleet_size(self):
+        return self.ships.bit_count()
+
+    def to_dict(self, catalog):
+        return {
+            "name": self.name,
+            "balance": self.balance,
+            "selected_ship": self.selected_ship,
+            "ships": catalog.names_of(self.ships),
+            "last_beg": self.last_beg,
+            "wins": self.wins,
+            "loses": self.loses,
+        }
+
+    @classmethod
+    def from_dict(cls, user_id, data, catalog):
+        ships = 0
+        for ship_name in data.get("ships", []):
+            ships |= 1 << catalog.intern(ship_name)
+
+        return cls(
+            user_id,
+            name=data.get("name", ""),
+            balance=data.get("balance", 0),
+            selected_ship=data.get("selected_ship", ""),
+            ships=ships,
+            last_beg=data.get("last_beg", ""),
+            wins=data.get("wins", 0),
+            loses=data.get("loses", 0),
+        )
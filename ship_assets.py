@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from urllib.parse import parse_qs, urlparse
+
+import discord
+
+from metrics import metrics
+from process_locks import file_lock
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+THUMBNAIL_SIZE = (640, 640)
+THUMBNAIL_QUALITY = 80
+
+
+def image_key(name):
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def match_image(ship_name, files):
+    # "USS Missouri (BB-63)" -> uss-missouri-bb-63.jpeg, "USS Arizona (BB-39)" -> uss-arizona.jpeg
+    key = image_key(ship_name)
+    best = None
+    for stem, path in files.items():
+        if stem == key:
+            return path
+        if key.startswith(stem) and (best is None or len(stem) > len(best[0])):
+            best = (stem, path)
+    return best[1] if best else None
+
+
+def url_expiry(url):
+    # Discord CDN attachment links carry their expiry as a hex timestamp in ?ex=
+    try:
+        return int(parse_qs(urlparse(url).query)["ex"][0], 16)
+    except (KeyError, ValueError):
+        return None
+
+
+def make_thumbnail(source, cache_dir):
+    with open(source, "rb") as f:
+        data = f.read()
+
+    settings = f"{THUMBNAIL_SIZE}:{THUMBNAIL_QUALITY}:{Image is not None}".encode()
+    digest = hashlib.sha256(data + settings).hexdigest()[:16]
+
+    if Image is None:
+        # without Pillow the original file is uploaded as it is
+        return digest, source, f"{digest}{os.path.splitext(source)[1].lower()}"
+
+    filename = f"{digest}.jpg"
+    path = os.path.join(cache_dir, filename)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with Image.open(source) as image:
+            if image.format == "JPEG" and image.width <= THUMBNAIL_SIZE[0] and image.height <= THUMBNAIL_SIZE[1]:
+                # already small, re-encoding would only cost quality
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+            else:
+                image.thumbnail(THUMBNAIL_SIZE)
+                image.convert("RGB").save(tmp_path, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+        os.replace(tmp_path, path)
+    return digest, path, filename
+
+
+class ShipAssets:
+    # each local image is attached to one message, after that every embed points at the attachment's CDN url
+    def __init__(self, catalog, image_dir="ship_images/ships", cache_dir="ship_images/cache"):
+        self.catalog = catalog
+        self.image_dir = image_dir
+        self.cache_dir = cache_dir
+        self.uploads_path = os.path.join(cache_dir, "uploads.json")
+        self.images = {}
+        self.uploads = {}
+        self.listeners = []
+        self.build_task = None
+        catalog.on_reload(self.on_catalog_reload)
+
+    def on_change(self, callback):
+        self.listeners.append(callback)
+        return callback
+
+    def changed(self):
+        for callback in self.listeners:
+            callback(self)
+
+    def on_catalog_reload(self, catalog=None):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.build_task = loop.create_task(self.build())
+
+    def prepare(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            files = {
+                image_key(os.path.splitext(filename)[0]): os.path.join(self.image_dir, filename)
+                for filename in sorted(os.listdir(self.image_dir))
+                if filename.lower().endswith(IMAGE_EXTENSIONS)
+            }
+        except FileNotFoundError:
+            files = {}
+
+        images = {}
+        for ship in self.catalog.all():
+            source = match_image(ship.name, files)
+            if source is None:
+                continue
+            try:
+                images[ship.name.lower()] = make_thumbnail(source, self.cache_dir)
+            except OSError as e:
+                print(f"Error: could not prepare the image for {ship.name}: {e}")
+
+        return images, self.read_uploads()
+
+    async def build(self):
+        loop = asyncio.get_running_loop()
+        images, uploads = await loop.run_in_executor(None, metrics.timed("ship_images_build", self.prepare))
+
+        self.images = images
+        for digest, upload in uploads.items():
+            self.uploads.setdefault(digest, upload)
+        print(f"Prepared {len(images)} local ship images ({len(self.uploads)} already uploaded).")
+        self.changed()
+
+    def read_uploads(self):
+        try:
+            with open(self.uploads_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_upload(self, digest, upload):
+        # merge, other shard processes upload into the same file
+        with file_lock(f"{self.uploads_path}.lock"):
+            uploads = self.read_uploads()
+            uploads[digest] = upload
+            tmp_path = f"{self.uploads_path}.tmp.{os.getpid()}"
+            with open(tmp_path, "w") as f:
+                json.dump(uploads, f, indent=4)
+            os.replace(tmp_path, self.uploads_path)
+
+    def uploaded_url(self, digest):
+        upload = self.uploads.get(digest)
+        if upload is None:
+            return None
+        # an hour of slack so an embed never goes out with a link about to die
+        expires = upload.get("expires")
+        if expires is not None and expires - 3600 < time.time():
+            return None
+        return upload["url"]
+
+    def url_for(self, ship):
+        # the uploaded copy, an attachment:// link when the file still has to go along, or the catalog's own url
+        image = self.images.get(ship.name.lower())
+        if image is None:
+            return ship.data.get("ship_image")
+        return self.uploaded_url(image[0]) or f"attachment://{image[2]}"
+
+    def public_url(self, ship):
+        # for messages that cannot carry a file
+        image = self.images.get(ship.name.lower())
+        if image is not None:
+            url = self.uploaded_url(image[0])
+            if url:
+                return url
+        return ship.data.get("ship_image")
+
+    def file_for(self, ship):
+        image = self.images.get(ship.name.lower())
+        if image is None or self.uploaded_url(image[0]):
+            return None
+        return discord.File(image[1], filename=image[2])
+
+    def remember(self, ship, message):
+        image = self.images.get(ship.name.lower())
+        if image is None or message is None:
+            return
+        attachment = next((a for a in getattr(message, "attachments", ()) if a.filename == image[2]), None)
+        if attachment is None:
+            return
+
+        upload = {"url": attachment.url, "expires": url_expiry(attachment.url)}
+        self.uploads[image[0]] = upload
+        self.changed()
+        asyncio.get_running_loop().run_in_executor(None, self.write_upload, image[0], upload)
+
+    def track(self, ship, future):
+        # future from say()/outbox.send for the message that carried the file
+        def sent(future):
+            if not future.cancelled() and future.exception() is None:
+                self.remember(ship, future.result())
+
+        future.add_done_callback(sent)
+        return future
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from catalog_build import load_catalog
+from metrics import metrics
+from records import iter_bits
+
+
+def find_stat(items, stat_name):
+    for item in items:
+        if item["name"].lower() == stat_name.lower():
+            return item["value"]
+    return None
+
+
+class Ship:
+    __slots__ = ("index", "name", "ship_type", "data", "hp", "attack", "defense", "price", "weapons")
+
+    # data is a ship as compiled by catalog_build.py, every list item is {"name": ..., "value": ...}
+    def __init__(self, data, index=None):
+        self.index = index
+        self.data = data
+        self.name = data["ship_name"]
+        self.ship_type = data["ship_type"]
+
+        stats = data["ship_stats"]
+        self.hp = find_stat(stats, "HP")
+        self.price = find_stat(stats, "Price")
+
+        self.weapons = tuple((weapon["name"], weapon["value"]) for weapon in data["ship_weapons"])
+        self.attack = sum(value for _, value in self.weapons)
+
+        # the first defense skill is the ship's defense value, same as the old get_ship_defense_value
+        self.defense = data["ship_defense_skills"][0]["value"]
+
+
+class ShipCatalog:
+    def __init__(self, path="ships.json", check_interval=5, auto_reload=True, snapshot_path=None):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.check_interval = check_interval
+        self.auto_reload = auto_reload
+        self.ships = []
+        self.by_name = {}
+        # every ship name ever seen gets a fixed index for the life of the process, owned ships are bitsets over them
+        self.names = []
+        self.indices = {}
+        self.by_index = []
+        self.intern_lock = threading.Lock()
+        self.mtime = None
+        self.version = 0
+        self.next_check = 0
+        self.listeners = []
+        # nothing to fall back to on the first load, a broken catalog stops the bot here instead of
+        # starting it with no ships
+        self.apply(*self.load())
+
+    def on_reload(self, callback):
+        self.listeners.append(callback)
+        return callback
+
+    def load(self):
+        with metrics.time_io("ships_read"):
+            mtime = os.stat(self.path).st_mtime
+            return mtime, load_catalog(self.path, self.snapshot_path)
+
+    def read_file(self):
+        # for reloads, a broken file is reported and the ships already loaded stay
+        try:
+            return self.load()
+        except (OSError, ValueError) as e:
+            print(f"Error: could not load {self.path}: {e}")
+            return None
+
+    def reload(self):
+        loaded = self.read_file()
+        if loaded is None:
+            return False
+        self.apply(*loaded)
+        return True
+
+    def intern(self, ship_name):
+        # names users own but the catalog no longer has keep their index too, so they survive a save
+        key = ship_name.lower()
+        index = self.indices.get(key)
+        if index is None:
+            with self.intern_lock:
+                index = self.indices.get(key)
+                if index is None:
+                    index = len(self.names)
+                    self.names.append(ship_name)
+                    self.indices[key] = index
+        return index
+
+    def names_of(self, bits):
+        return [self.names[index] for index in iter_bits(bits)]
+
+    def ships_in(self, bits):
+        by_index = self.by_index
+        return [by_index[index] for index in iter_bits(bits) if index < len(by_index) and by_index[index] is not None]
+
+    def apply(self, mtime, raw_ships):
+        ships = [Ship(data) for data in raw_ships]
+        by_index = [None] * (len(self.names) + len(ships))
+        for ship in ships:
+            ship.index = self.intern(ship.name)
+            self.names[ship.index] = ship.name
+            by_index[ship.index] = ship
+        del by_index[len(self.names):]
+
+        self.ships = ships
+        self.by_name = {ship.name.lower(): ship for ship in ships}
+        self.by_index = by_index
+        self.mtime = mtime
+        self.version += 1
+        print(f"Loaded {len(ships)} ships from {self.path}")
+
+        for callback in self.listeners:
+            callback(self)
+
+    def check_for_changes(self):
+        # at most one stat() per check_interval, lookups themselves never touch disk
+        if not self.auto_reload:
+            return
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + self.check_interval
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self.mtime:
+            self.reload()
+
+    async def watch(self, executor=None):
+        # the bot's way of reloading: stat and parse in an executor, swap the index in on the loop
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                mtime = await loop.run_in_executor(executor, os.path.getmtime, self.path)
+            except OSError:
+                continue
+            if mtime == self.mtime:
+                continue
+
+            loaded = await loop.run_in_executor(executor, self.read_file)
+            if loaded is not None:
+                self.apply(*loaded)
+
+    def get(self, ship_name):
+        self.check_for_changes()
+        if not ship_name:
+            return None
+        return self.by_name.get(ship_name.lower())
+
+    def all(self):
+        self.check_for_changes()
+        return self.ships
+
+    def random(self, exclude=()):
+        excluded = {name.lower() for name in exclude}
+        candidates = [ship for ship in self.all() if ship.name.lower() not in excluded]
+        return random.choice(candidates) if candidates else None
+
+    def __len__(self):
+        return len(self.ships)
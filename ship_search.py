@@ -0,0 +1,123 @@
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+# share of the query's trigrams a name must contain to be suggested
+MIN_SCORE = 0.6
+NAME_PREFIXES = ("uss ", "hms ", "rms ", "sms ", "ins ", "hmas ", "hmcs ")
+
+
+def normalize(text):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def aliases_for(ship):
+    # "USS Enterprise (CVN-65)" is also "USS Enterprise", "Enterprise" and "CVN-65"
+    names = list(ship.data.get("ship_aliases", []))
+    base = re.sub(r"\s*\(.*?\)", "", ship.name).strip()
+    names.append(base)
+    names.extend(re.findall(r"\((.*?)\)", ship.name))
+    for prefix in NAME_PREFIXES:
+        if base.lower().startswith(prefix):
+            names.append(base[len(prefix):])
+    return [normalize(name) for name in names]
+
+
+class ShipIndex:
+    # prefix and trigram lookups over ship names and aliases, rebuilt whenever the catalog reloads
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.exact = {}
+        self.entries = []
+        self.prefixes = []
+        self.grams = {}
+        self.rebuild()
+        catalog.on_reload(self.rebuild)
+
+    def rebuild(self, catalog=None):
+        ships = self.catalog.ships
+        exact = {}
+        entries = []
+        prefixes = []
+        grams = defaultdict(list)
+
+        # real names first, so an alias never shadows another ship's name
+        keys = [(normalize(ship.name), ship) for ship in ships]
+        keys += [(alias, ship) for ship in ships for alias in aliases_for(ship)]
+
+        for key, ship in keys:
+            if not key or key in exact:
+                continue
+            exact[key] = ship
+            entry = len(entries)
+            entries.append((key, ship, frozenset(trigrams(key))))
+
+            # every word is a way in, "enterprise" finds "uss enterprise cvn 65"
+            words = key.split()
+            for i in range(len(words)):
+                prefixes.append((" ".join(words[i:]), entry))
+            for gram in trigrams(key):
+                grams[gram].append(entry)
+
+        prefixes.sort()
+        self.exact = exact
+        self.entries = entries
+        self.prefixes = prefixes
+        self.grams = dict(grams)
+
+    def resolve(self, name):
+        # the ship a name or alias means, ignoring case and punctuation
+        if not name:
+            return None
+        return self.exact.get(normalize(name))
+
+    def fuzzy(self, query, limit):
+        query_grams = trigrams(query)
+        # a match holds at least `needed` of the query's trigrams, so it holds one of the rarest
+        # len - needed + 1 of them; only those postings are read. Grams in a big share of all names
+        # ("uss", "hms") are skipped too, a name matching on nothing but those is no suggestion anyway
+        rarest = sorted(query_grams, key=lambda gram: len(self.grams.get(gram, ())))
+        needed = math.ceil(MIN_SCORE * len(query_grams))
+        common = max(100, len(self.entries) // 20)
+        candidates = set()
+        for gram in rarest[:len(rarest) - needed + 1]:
+            postings = self.grams.get(gram, ())
+            if len(postings) > common:
+                break
+            candidates.update(postings)
+
+        best = {}
+        for entry in candidates:
+            key, ship, entry_grams = self.entries[entry]
+            # shorter names win ties, "queen mary" before "queen mary 2"
+            score = (len(query_grams & entry_grams) / len(query_grams), -len(key))
+            if score[0] >= MIN_SCORE and score > best.get(ship.name, ((0, 0),))[0]:
+                best[ship.name] = (score, ship)
+        return [ship for _, ship in heapq.nlargest(limit, best.values(), key=lambda item: item[0])]
+
+    def search(self, query, limit=25):
+        # names starting with the query, or typo-tolerant matches when none do; for autocomplete and "did you mean"
+        query = normalize(query or "")
+        if not query:
+            return self.catalog.ships[:limit]
+
+        results = []
+        seen = set()
+        i = bisect_left(self.prefixes, (query,))
+        while i < len(self.prefixes) and len(results) < limit and self.prefixes[i][0].startswith(query):
+            ship = self.entries[self.prefixes[i][1]][1]
+            if ship.name not in seen:
+                seen.add(ship.name)
+                results.append(ship)
+            i += 1
+
+        if not results and len(query) >= 3:
+            results = self.fuzzy(query, limit)
+        return results
@@ -0,0 +1,54 @@
+import discord
+
+
+class ShopView(discord.ui.View):
+    # pages are rendered by the EmbedCache only when someone flips to them
+    def __init__(self, embed_cache, owned, shop_filter, author_id, page_count, timeout=120):
+        super().__init__(timeout=timeout)
+        self.embed_cache = embed_cache
+        self.owned = owned
+        self.shop_filter = shop_filter
+        self.author_id = author_id
+        self.page = 0
+        self.page_count = page_count
+        self.message = None
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("This is someone else's shop, open your own with `$shop`.", ephemeral=True)
+            return False
+        return True
+
+    async def show(self, interaction):
+        embed, page_count = self.embed_cache.shop_page(self.owned, self.shop_filter, self.page)
+        if embed is None:
+            await interaction.response.edit_message(content="You own all the ships already!", embed=None, view=None)
+            self.stop()
+            return
+
+        self.page_count = page_count
+        self.page = min(self.page, page_count - 1)
+        self.update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        self.page -= 1
+        await self.show(interaction)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction, button):
+        self.page += 1
+        await self.show(interaction)
+
+    async def on_timeout(self):
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
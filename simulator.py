@@ -0,0 +1,128 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from battle import SPAWN_EXCLUDED, RETALIATION_MIN, DEFEND_BOOST_MIN, LOOT_MIN, LOOT_MAX
+from ship_catalog import ShipCatalog
+
+# Plays conquer battles offline with the same rules as the bot, many fights at once per ship pair.
+# The captain attacks every turn, or defends with probability --defend-rate, and never runs away.
+# Needs numpy: pip install numpy
+
+
+def simulate_pair(player, enemy, fights, rng, defend_rate=0.0, max_turns=1000):
+    weapons = np.array([value for _, value in player.weapons] or [0], dtype=np.int64)
+    retaliation_max = max(enemy.attack, RETALIATION_MIN)
+
+    user_hp = np.full(fights, player.hp, dtype=np.int64)
+    enemy_hp = np.full(fights, enemy.hp, dtype=np.int64)
+    user_defense = np.full(fights, player.defense, dtype=np.int64)
+    turns = np.zeros(fights, dtype=np.int64)
+    ongoing = np.arange(fights)
+
+    for _ in range(max_turns):
+        if not ongoing.size:
+            break
+        n = ongoing.size
+
+        defend = rng.random(n) < defend_rate if defend_rate else np.zeros(n, dtype=bool)
+
+        damage = weapons[rng.integers(0, weapons.size, n)]
+        damage[defend] = 0
+        enemy_hp[ongoing] -= damage
+
+        if defend.any():
+            defenders = ongoing[defend]
+            low = np.minimum(DEFEND_BOOST_MIN, user_defense[defenders])
+            user_defense[defenders] += rng.integers(low, user_defense[defenders] + 1)
+
+        enemy_alive = enemy_hp[ongoing] > 0
+        retaliation = rng.integers(RETALIATION_MIN, retaliation_max + 1, n)
+        user_hp[ongoing] -= np.where(enemy_alive, retaliation, 0)
+        turns[ongoing] += 1
+
+        ongoing = ongoing[(user_hp[ongoing] > 0) & (enemy_hp[ongoing] > 0)]
+
+    won = enemy_hp <= 0
+    lost = user_hp <= 0
+    wins = int(won.sum())
+    loot = rng.integers(LOOT_MIN, LOOT_MAX + 1, wins)
+
+    return {
+        "fights": fights,
+        "win_rate": wins / fights,
+        "loss_rate": float(lost.sum()) / fights,
+        "unfinished": int(ongoing.size),
+        "mean_turns_to_kill": float(turns[won].mean()) if wins else None,
+        "mean_turns": float(turns.mean()),
+        "loot_per_fight": float(loot.sum()) / fights,
+        "loot_p50": float(np.percentile(loot, 50)) if wins else 0.0,
+        "loot_p95": float(np.percentile(loot, 95)) if wins else 0.0,
+        "captured_value_per_fight": (enemy.price or 0) * wins / fights,
+    }
+
+
+def simulate_catalog(catalog, fights, seed=None, defend_rate=0.0, max_turns=1000, include_excluded=False):
+    rng = np.random.default_rng(seed)
+    players = catalog.all()
+    excluded = {name.lower() for name in SPAWN_EXCLUDED}
+    enemies = [ship for ship in players if include_excluded or ship.name.lower() not in excluded]
+
+    results = {}
+    for player in players:
+        for enemy in enemies:
+            results[(player.name, enemy.name)] = simulate_pair(player, enemy, fights, rng, defend_rate, max_turns)
+    return players, enemies, results
+
+
+def print_matrix(title, players, enemies, results, key, fmt):
+    width = 12
+    print(f"\n{title} (rows: your ship, columns: enemy)")
+    print(" " * 26 + "".join(enemy.name[:width - 1].rjust(width) for enemy in enemies))
+    for player in players:
+        cells = []
+        for enemy in enemies:
+            value = results[(player.name, enemy.name)][key]
+            cells.append(("-" if value is None else fmt.format(value)).rjust(width))
+        print(player.name[:25].ljust(26) + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo balance check for the ship catalog")
+    parser.add_argument("--catalog", default="ships.json")
+    parser.add_argument("--fights", type=int, default=100000, help="fights per ship pair")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--defend-rate", type=float, default=0.0, help="chance the captain defends instead of attacking")
+    parser.add_argument("--max-turns", type=int, default=1000, help="fights still going after this many turns count as unfinished")
+    parser.add_argument("--include-excluded", action="store_true", help="also fight ships that never spawn (SUPER BATTLE SHIP)")
+    parser.add_argument("--json", dest="json_path", help="write the full results to this file")
+    args = parser.parse_args()
+
+    catalog = ShipCatalog(args.catalog, auto_reload=False)
+
+    started = time.perf_counter()
+    players, enemies, results = simulate_catalog(
+        catalog, args.fights, args.seed, args.defend_rate, args.max_turns, args.include_excluded
+    )
+    elapsed = time.perf_counter() - started
+    total = args.fights * len(results)
+    print(f"Simulated {total:,} fights over {len(results)} ship pairs in {elapsed:.2f}s")
+
+    print_matrix("Win rate", players, enemies, results, "win_rate", "{:.1%}")
+    print_matrix("Mean turns to kill", players, enemies, results, "mean_turns_to_kill", "{:.1f}")
+    print_matrix("Loot per fight", players, enemies, results, "loot_per_fight", "{:,.0f}")
+
+    unfinished = sum(result["unfinished"] for result in results.values())
+    if unfinished:
+        print(f"\n{unfinished:,} fights hit --max-turns {args.max_turns} and were left unfinished")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump([{"ship": player, "enemy": enemy, **result} for (player, enemy), result in results.items()], f, indent=4)
+        print(f"Wrote results to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import asyncio
+import heapq
+import json
+import os
+import random
+import time
+
+from process_locks import file_lock
+
+
+class SpawnScheduler:
+    # one task and one heap of (deadline, guild_id, generation) for every guild the bot is in
+    def __init__(self, on_due, config_path="spawn_channels.json", min_interval=60, max_interval=180):
+        self.on_due = on_due
+        self.config_path = config_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.heap = []
+        self.generations = {}
+        self.counter = 0
+        self.channels = self.load_config()
+        self.wakeup = None
+        self.task = None
+        self.pending = set()
+
+    def load_config(self):
+        try:
+            with open(self.config_path, "r") as f:
+                return {int(guild_id): set(channel_ids) for guild_id, channel_ids in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+
+    def write_guild_config(self, guild_id, channel_ids):
+        # every shard process owns different guilds, so only this guild's entry is rewritten
+        with file_lock(f"{self.config_path}.lock"):
+            try:
+                with open(self.config_path, "r") as f:
+                    config = json.load(f)
+            except FileNotFoundError:
+                config = {}
+
+            if channel_ids:
+                config[str(guild_id)] = channel_ids
+            else:
+                config.pop(str(guild_id), None)
+
+            tmp_path = f"{self.config_path}.tmp.{os.getpid()}"
+            with open(tmp_path, "w") as f:
+                json.dump(config, f, indent=4)
+            os.replace(tmp_path, self.config_path)
+
+    async def save_config(self, guild_id):
+        channel_ids = sorted(self.channels.get(guild_id, ()))
+        await asyncio.get_running_loop().run_in_executor(None, self.write_guild_config, guild_id, channel_ids)
+
+    def channels_for(self, guild_id):
+        return self.channels.get(guild_id, set())
+
+    async def add_channel(self, guild_id, channel_id):
+        self.channels.setdefault(guild_id, set()).add(channel_id)
+        await self.save_config(guild_id)
+
+    async def remove_channel(self, guild_id, channel_id):
+        self.channels.get(guild_id, set()).discard(channel_id)
+        await self.save_config(guild_id)
+
+    def next_delay(self):
+        return random.uniform(self.min_interval, self.max_interval)
+
+    def add_guild(self, guild_id, delay=None):
+        if guild_id in self.generations:
+            return
+        self.generations[guild_id] = 0
+        self.schedule(guild_id, self.next_delay() if delay is None else delay)
+
+    def remove_guild(self, guild_id):
+        # the heap entry stays behind and is dropped when it comes due
+        self.generations.pop(guild_id, None)
+
+    def schedule(self, guild_id, delay):
+        # a fresh generation number makes every older heap entry for this guild stale
+        self.counter += 1
+        generation = self.generations[guild_id] = self.counter
+        deadline = time.monotonic() + delay
+        was_first = not self.heap or deadline < self.heap[0][0]
+        heapq.heappush(self.heap, (deadline, guild_id, generation))
+        if was_first and self.wakeup is not None:
+            self.wakeup.set()
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            timeout = self.heap[0][0] - time.monotonic() if self.heap else None
+
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.monotonic()
+            while self.heap and self.heap[0][0] <= now:
+                _, guild_id, generation = heapq.heappop(self.heap)
+                if self.generations.get(guild_id) != generation:
+                    continue
+                self.schedule(guild_id, self.next_delay())
+                task = asyncio.create_task(self.fire(guild_id))
+                self.pending.add(task)
+                task.add_done_callback(self.pending.discard)
+
+    async def fire(self, guild_id):
+        try:
+            await self.on_due(guild_id)
+        except Exception as e:
+            print(f"Spawn in guild {guild_id} failed: {e}")
@@ -0,0 +1,279 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+
+class UserStore(ABC):
+    # a backend missing one of the abstract methods fails when it is created, not at its first call
+    @abstractmethod
+    def get(self, user_id):
+        pass
+
+    @abstractmethod
+    def put(self, user_id, data):
+        pass
+
+    def put_many(self, items):
+        for user_id, data in items:
+            self.put(user_id, data)
+
+    @abstractmethod
+    def delete(self, user_id):
+        pass
+
+    @abstractmethod
+    def all(self):
+        pass
+
+    @abstractmethod
+    def cooldowns(self, now):
+        # [(key, expires)] still running at `now`
+        pass
+
+    @abstractmethod
+    def put_cooldowns(self, items):
+        # (key, expires) pairs, expires None removes the cooldown
+        pass
+
+    def claim_legacy(self, user_id, name):
+        # records used to be keyed by username, the first time we see the owner theirs moves to their Discord ID
+        if name.isdigit():
+            return None
+        data = self.get(name)
+        if data is None:
+            return None
+        data = dict(data, name=name)
+        self.put(user_id, data)
+        self.delete(name)
+        return data
+
+    def close(self):
+        pass
+
+
+class JsonUserStore(UserStore):
+    # the old behaviour: every write rewrites the whole file
+    def __init__(self, path="users.json"):
+        self.path = path
+        self.cooldowns_path = os.path.splitext(path)[0] + ".cooldowns.json"
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, user_id):
+        return self._load().get(user_id)
+
+    def put(self, user_id, data):
+        self.put_many([(user_id, data)])
+
+    def put_many(self, items):
+        users = self._load()
+        for user_id, data in items:
+            users[user_id] = data
+        self._write(users)
+
+    def delete(self, user_id):
+        users = self._load()
+        if users.pop(user_id, None) is not None:
+            self._write(users)
+
+    def claim_legacy(self, user_id, name):
+        if name.isdigit():
+            return None
+        users = self._load()
+        if user_id in users:
+            return users[user_id]
+        data = users.pop(name, None)
+        if data is None:
+            return None
+        data = users[user_id] = dict(data, name=name)
+        self._write(users)
+        return data
+
+    def _write(self, users, path=None):
+        # write next to the real file and rename over it, a crash mid-write never leaves a truncated users.json
+        path = path or self.path
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(users, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _load_cooldowns(self):
+        try:
+            with open(self.cooldowns_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def cooldowns(self, now):
+        return [(key, expires) for key, expires in self._load_cooldowns().items() if expires > now]
+
+    def put_cooldowns(self, items):
+        cooldowns = self._load_cooldowns()
+        for key, expires in items:
+            if expires is None:
+                cooldowns.pop(key, None)
+            else:
+                cooldowns[key] = expires
+        self._write(cooldowns, self.cooldowns_path)
+
+    def all(self):
+        return self._load().items()
+
+
+class SqliteUserStore(UserStore):
+    def __init__(self, path="users.db", migrate_from="users.json"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # shard processes share the file, wait for another writer instead of failing with "database is locked"
+        self.conn.execute("PRAGMA busy_timeout=10000")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cooldowns (key TEXT PRIMARY KEY, expires REAL NOT NULL)")
+
+        if migrate_from:
+            self.migrate(migrate_from)
+
+    def migrate(self, json_path):
+        if not os.path.exists(json_path):
+            return
+
+        with self.lock:
+            # check inside the write transaction so two processes starting together cannot both migrate
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                done = self.conn.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+                if done:
+                    self.conn.execute("ROLLBACK")
+                    return
+
+                with open(json_path, "r") as f:
+                    users = json.load(f)
+
+                # INSERT OR IGNORE so a record already written through sqlite is never overwritten
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO users (user_id, data) VALUES (?, ?)",
+                    ((user_id, json.dumps(data)) for user_id, data in users.items()),
+                )
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_from', ?)", (json_path,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        print(f"Migrated {len(users)} users from {json_path} to {self.path}")
+
+    def get(self, user_id):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, user_id, data):
+        self.put_many([(user_id, data)])
+
+    def put_many(self, items):
+        rows = [(user_id, json.dumps(data)) for user_id, data in items]
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO users (user_id, data) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+                    rows,
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, user_id):
+        with self.lock:
+            self.conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+    def claim_legacy(self, user_id, name):
+        if name.isdigit():
+            return None
+
+        with self.lock:
+            # nearly every lookup that gets here is a user with no record at all, a plain read settles
+            # that without taking the write lock all shard processes share
+            rows = dict(self.conn.execute("SELECT user_id, data FROM users WHERE user_id IN (?, ?)", (user_id, name)).fetchall())
+            if user_id in rows:
+                return json.loads(rows[user_id])
+            if name not in rows:
+                return None
+
+            # one write transaction, so two shard processes cannot both move the same record
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+                if row:
+                    self.conn.execute("COMMIT")
+                    return json.loads(row[0])
+
+                row = self.conn.execute("SELECT data FROM users WHERE user_id = ?", (name,)).fetchone()
+                if row is None:
+                    self.conn.execute("COMMIT")
+                    return None
+
+                data = dict(json.loads(row[0]), name=name)
+                self.conn.execute("INSERT INTO users (user_id, data) VALUES (?, ?)", (user_id, json.dumps(data)))
+                self.conn.execute("DELETE FROM users WHERE user_id = ?", (name,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return data
+
+    def cooldowns(self, now):
+        with self.lock:
+            self.conn.execute("DELETE FROM cooldowns WHERE expires <= ?", (now,))
+            return self.conn.execute("SELECT key, expires FROM cooldowns").fetchall()
+
+    def put_cooldowns(self, items):
+        items = list(items)
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO cooldowns (key, expires) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET expires = excluded.expires",
+                    [(key, expires) for key, expires in items if expires is not None],
+                )
+                self.conn.executemany(
+                    "DELETE FROM cooldowns WHERE key = ?",
+                    [(key,) for key, expires in items if expires is None],
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def all(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT user_id, data FROM users").fetchall()
+        return ((user_id, json.loads(data)) for user_id, data in rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_user_store():
+    backend = os.getenv("USER_STORE", "sqlite")
+    if backend == "json":
+        return JsonUserStore(os.getenv("USERS_JSON", "users.json"))
+    if backend == "sqlite":
+        return SqliteUserStore(os.getenv("USERS_DB", "users.db"), migrate_from=os.getenv("USERS_JSON", "users.json"))
+    raise ValueError(f"Unknown USER_STORE backend: {backend}")